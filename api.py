@@ -0,0 +1,223 @@
+import hashlib
+import sqlalchemy as sa
+from flask import Blueprint, abort, current_app, jsonify, request, url_for
+from flask_login import login_required, current_user
+from werkzeug.http import is_resource_modified
+from models import db, Equipment, Project, Task, TrailSystem, ExpenseReport, utcnow
+from maintenance import due_equipment
+from task_counts import progress
+from pagination import keyset_paginate
+from instrumentation import query_budget
+from versions import table_versions
+from bulk import KINDS as BULK_KINDS, delete_rows, json_value, selected_ids, update_status
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+class Resource:
+    def __init__(self, model, fields, filters, owned=False, tables=None):
+        self.model = model
+        self.fields = fields
+        self.filters = filters  # query arg -> function building the WHERE clause
+        self.owned = owned  # limited to the current user's rows, like the HTML list
+        self.tables = tables or (model.__tablename__,)  # every table a listing reads, for its validators
+
+
+def _equals(column):
+    return lambda value: column == value
+
+
+def _int_equals(column):
+    def clause(value):
+        try:
+            return column == int(value)
+        except ValueError:
+            abort(400, description=f'{column.key} must be an integer')
+    return clause
+
+
+RESOURCES = {
+    'tasks': Resource(Task, ['id', 'name', 'description', 'status', 'project_id', 'updated_at'], {
+        'status': _equals(Task.status),
+        'project_id': _int_equals(Task.project_id),
+        'trail_system_id': lambda value: Task.project_id.in_(
+            sa.select(Project.id).where(_int_equals(Project.trail_system_id)(value))),
+    }, tables=('tasks', 'projects')),
+    'equipment': Resource(Equipment, ['id', 'name', 'description', 'status', 'maintenance_schedule',
+                                      'maintenance_interval', 'maintenance_unit', 'last_maintained_at', 'next_due',
+                                      'user_id', 'updated_at'], {
+        'status': _equals(Equipment.status),
+    }),
+    'projects': Resource(Project, ['id', 'name', 'description', 'status', 'trail_system_id', 'updated_at'], {
+        'status': _equals(Project.status),
+        'trail_system_id': _int_equals(Project.trail_system_id),
+    }, owned=True),
+    'trail_systems': Resource(TrailSystem, ['id', 'name', 'location', 'map', 'description', 'updated_at'], {}),
+    'expense_reports': Resource(ExpenseReport, ['id', 'date_submitted', 'amount', 'expense_details', 'status',
+                                                'updated_at'], {
+        'status': _equals(ExpenseReport.status),
+    }, owned=True),
+}
+
+
+def _resource(name):
+    resource = RESOURCES.get(name)
+    if resource is None:
+        abort(404)
+    return resource
+
+
+def _selected_fields(resource):
+    # fields=a,b picks the columns to SELECT; id always comes along for paging
+    requested = request.args.get('fields')
+    if not requested:
+        return resource.fields
+    fields = [field.strip() for field in requested.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in resource.fields]
+    if unknown:
+        abort(400, description=f'Unknown fields: {", ".join(unknown)}')
+    return ['id'] + [field for field in fields if field != 'id']
+
+
+def _conditions(resource):
+    conditions = []
+    if resource.owned:
+        conditions.append(resource.model.user_id == current_user.id)
+    for name, clause in resource.filters.items():
+        value = request.args.get(name)
+        if value is not None:
+            conditions.append(clause(value))
+    return conditions
+
+
+def _not_modified(validators, last_modified):
+    # The hash covers the query string, so each page, filter and projection gets its own ETag
+    etag = hashlib.sha1(repr((request.path, sorted(request.args.items(multi=True)), validators)).encode()).hexdigest()
+    return etag, not is_resource_modified(request.environ, etag=etag, last_modified=last_modified)
+
+
+def _respond(payload, etag, last_modified):
+    # payload is None for a 304
+    response = jsonify(payload) if payload is not None else current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True  # always revalidate, which is a 304 when nothing changed
+    return response
+
+
+def _serialize(row, fields):
+    return {field: json_value(getattr(row, field)) for field in fields}
+
+
+def _page_url(**cursor):
+    args = {key: value for key, value in request.args.items() if key not in ('after', 'before')}
+    return url_for(request.endpoint, **request.view_args, **args, **cursor, _external=True)
+
+
+@api.route('/equipment/due', methods=['GET'])
+@login_required
+@query_budget()
+def equipment_due():
+    # Overdue and upcoming in due order; no ETag since "due" moves with the clock
+    days = request.args.get('days', 14, type=int)
+    if not 0 <= days <= 3650:
+        abort(400, description='days must be between 0 and 3650')
+    fields = _selected_fields(RESOURCES['equipment'])
+    due, truncated = due_equipment(days, utcnow())
+    return jsonify(data=[_serialize(row, fields) for row in due], days=days, truncated=truncated)
+
+
+@api.route('/projects/<int:project_id>/progress', methods=['GET'])
+@login_required
+def project_progress(project_id):
+    # Served from the per-status counts table; the tasks themselves are never read
+    if db.session.scalar(sa.select(Project.id).where(Project.id == project_id, Project.user_id == current_user.id)) is None:
+        abort(404)
+    return jsonify(data={'project_id': project_id, **progress([project_id])[project_id]})
+
+
+@api.route('/<resource_name>', methods=['GET'])
+@login_required
+@query_budget()
+def list_resource(resource_name):
+    resource = _resource(resource_name)
+    model = resource.model
+    fields = _selected_fields(resource)
+    conditions = _conditions(resource)
+
+    # Validators come from the table versions, one row per table whatever the table sizes.
+    # They move on every insert, update and delete, so Last-Modified does too, unlike
+    # max(updated_at). Owned listings differ per user under the same URL.
+    stamps = table_versions(*resource.tables)
+    last_modified = max((changed_at for _, changed_at in stamps.values() if changed_at), default=None)
+    etag, not_modified = _not_modified((sorted(stamps.items()), resource.owned and current_user.id), last_modified)
+    if not_modified:
+        return _respond(None, etag, last_modified)
+
+    query = db.session.query(*(getattr(model, field) for field in fields)).filter(*conditions)
+    page = keyset_paginate(query, model.id)
+    payload = {
+        'data': [_serialize(row, fields) for row in page],
+        'next': _page_url(after=page.next_cursor) if page.has_next else None,
+        'prev': _page_url(before=page.prev_cursor) if page.has_prev else None,
+    }
+    return _respond(payload, etag, last_modified)
+
+
+def _bulk_request(resource_name):
+    # The JSON body of a bulk write and its validated ids
+    if resource_name not in BULK_KINDS:
+        abort(404)
+    payload = request.get_json(silent=True)
+    ids = payload.get('ids') if isinstance(payload, dict) else None
+    if not isinstance(ids, list):
+        abort(400, description='Send {"ids": [...]}')
+    try:
+        return payload, selected_ids(ids)
+    except ValueError as e:
+        abort(400, description=str(e))
+
+
+@api.route('/<resource_name>', methods=['DELETE'])
+@login_required
+def delete_resources(resource_name):
+    # Body: {"ids": [...]}; removed in one statement, see bulk.delete_rows
+    _, ids = _bulk_request(resource_name)
+    return jsonify(delete_rows(resource_name, ids, current_user.id))
+
+
+@api.route('/<resource_name>', methods=['PATCH'])
+@login_required
+def update_resources_status(resource_name):
+    # Body: {"ids": [...], "status": "..."}; one UPDATE for the lot, see bulk.update_status
+    payload, ids = _bulk_request(resource_name)
+    try:
+        results = update_status(resource_name, ids, payload.get('status'), current_user.id)
+    except ValueError as e:
+        abort(400, description=str(e))
+    return jsonify(results=[{'id': id, 'result': result} for id, result in results.items()])
+
+
+@api.route('/<resource_name>/<int:item_id>', methods=['GET'])
+@login_required
+def get_resource(resource_name, item_id):
+    resource = _resource(resource_name)
+    model = resource.model
+    fields = _selected_fields(resource)
+    conditions = _conditions(resource)
+
+    row = db.session.execute(
+        sa.select(model.updated_at.label('last_modified'), *(getattr(model, field) for field in fields))
+        .where(model.id == item_id, *conditions)
+    ).first()
+    if row is None:
+        abort(404)
+    etag, not_modified = _not_modified((row.id, row.last_modified), row.last_modified)
+    return _respond(None if not_modified else {'data': _serialize(row, fields)}, etag, row.last_modified)
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+    return jsonify(error=error.description), error.code
@@ -0,0 +1,126 @@
+import datetime
+import json
+import re
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+import sqlalchemy as sa
+from models import db, User, TrailSystem, Project, Task, Equipment, ExpenseReport
+from seed import SEED_PASSWORD
+
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+def percentile(samples, pct):
+    # Nearest-rank percentile over an already sorted list
+    if not samples:
+        return None
+    rank = max(1, int(round(pct / 100 * len(samples))))
+    return samples[min(rank, len(samples)) - 1]
+
+
+def default_routes():
+    # List pages at the first page and deep into the table, plus one detail page each,
+    # so a page cost that grows with table size shows up as a gap between the pairs.
+    def middle_id(model):
+        return db.session.scalar(sa.select(sa.func.max(model.id))) // 2 or 1
+
+    user = db.session.scalar(sa.select(User).where(User.username.like('crew%')).order_by(User.id))
+    routes = ['/', '/users', '/equipment', '/trail_systems', '/projects', '/tasks', '/expense_reports']
+    routes += [f'/tasks?after={middle_id(Task)}', f'/equipment?after={middle_id(Equipment)}']
+    routes += [f'/tasks/{middle_id(Task)}', f'/projects/{middle_id(Project)}',
+               f'/equipment/{middle_id(Equipment)}', f'/trail_systems/{middle_id(TrailSystem)}',
+               f'/users/{user.id}']
+    return user.username, routes
+
+
+def table_counts():
+    return {model.__tablename__: db.session.scalar(sa.select(sa.func.count()).select_from(model))
+            for model in (User, TrailSystem, Project, Task, Equipment, ExpenseReport)}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_route(client, route, requests, warmup):
+    for _ in range(warmup):
+        client.get(route)
+
+    latencies, db_times, query_counts, statuses = [], [], [], set()
+    started = time.perf_counter()
+    for _ in range(requests):
+        t0 = time.perf_counter()
+        response = client.get(route)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        statuses.add(response.status_code)
+        match = SERVER_TIMING_DB.search(response.headers.get('Server-Timing', ''))
+        if match:
+            db_times.append(float(match.group(1)))
+            query_counts.append(int(match.group(2)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'statuses': sorted(statuses),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'max_ms': round(latencies[-1], 3),
+        'throughput_rps': round(requests / elapsed, 1),
+        'queries': max(query_counts) if query_counts else None,
+        'db_ms_mean': round(sum(db_times) / len(db_times), 3) if db_times else None,
+    }
+
+
+def _run(app, routes, requests, warmup):
+    # Drives the real routes in-process through the test client, logged in as a seeded user
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        username, default = default_routes()
+        routes = routes or default
+        meta = {
+            'revision': git_revision(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'database': db.engine.dialect.name,
+            'rows': table_counts(),
+        }
+
+    client = app.test_client()
+    response = client.post('/login', data={'username': username, 'password': SEED_PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f'Could not log in as {username}; seed the database first')
+
+    results = {route: bench_route(client, route, requests, warmup) for route in routes}
+    return {'meta': meta, 'routes': results}
+
+
+def run_benchmark(app, routes=None, requests=200, warmup=10):
+    # The flask CLI keeps an app context pushed, which would make every request share one
+    # session and identity map. A fresh thread starts without it, like a real server worker.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(_run, app, routes, requests, warmup).result()
+
+
+def compare(baseline, current, tolerance=0.2):
+    # Returns the routes whose p95 latency or query count regressed past the tolerance
+    regressions = []
+    for route, stats in current['routes'].items():
+        before = baseline['routes'].get(route)
+        if not before:
+            continue
+        if stats['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f'{route}: p95 {before["p95_ms"]}ms -> {stats["p95_ms"]}ms')
+        if before['queries'] is not None and stats['queries'] is not None and stats['queries'] > before['queries']:
+            regressions.append(f'{route}: queries {before["queries"]} -> {stats["queries"]}')
+    return regressions
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,211 @@
+import csv
+import datetime
+import io
+import json
+from decimal import Decimal
+import sqlalchemy as sa
+from werkzeug.datastructures import MultiDict
+from models import db, Equipment, Project, Task, ExpenseReport, utcnow
+from forms import EquipmentForm, TaskForm, ExpenseReportForm
+import expense_summary
+import task_counts
+from maintenance import schedule_columns
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+MAX_SELECTED = 1000  # ids per bulk delete or status change
+
+
+class BulkKind:
+    def __init__(self, model, form, fields, defaults, owned, owner, derived=None):
+        self.model = model
+        self.form = form
+        self.fields = fields
+        self.defaults = defaults
+        self.owned = owned  # exports are limited to the requesting user's rows
+        self.owner = owner  # user id -> WHERE clause for the rows that user may change in bulk
+        self.derived = derived  # validated form -> extra column values computed at write time
+
+    @property
+    def status_choices(self):
+        return self.form.status.kwargs['choices']
+
+
+KINDS = {
+    'equipment': BulkKind(Equipment, EquipmentForm, ['name', 'description', 'status', 'maintenance_schedule'],
+                          {'status': 'active'}, owned=False,
+                          owner=lambda user_id: Equipment.user_id == user_id,
+                          derived=lambda form: schedule_columns(*form.maintenance_rule, None, utcnow())),
+    'tasks': BulkKind(Task, TaskForm, ['name', 'description', 'status', 'project_id'],
+                      {'status': 'not started'}, owned=False,
+                      owner=lambda user_id: Task.project_id.in_(sa.select(Project.id).where(Project.user_id == user_id))),
+    'expense_reports': BulkKind(ExpenseReport, ExpenseReportForm,
+                                ['date_submitted', 'amount', 'expense_details', 'status'],
+                                {'status': 'submitted'}, owned=True,
+                                owner=lambda user_id: ExpenseReport.user_id == user_id),
+}
+
+
+def read_rows(stream, fmt):
+    # Yields (line number, dict) pairs one at a time, so the file is never held in memory
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(text, start=1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError:
+                    yield line_number, None
+    else:
+        raise ValueError(f'Unsupported format {fmt!r}; use csv or jsonl')
+
+
+def validate_row(kind, row):
+    # Same rules as the single-item forms, minus CSRF, which does not apply to a file import
+    values = dict(kind.defaults)
+    values.update({key: '' if value is None else str(value) for key, value in row.items() if key in kind.fields})
+    form = kind.form(formdata=MultiDict(values), meta={'csrf': False})
+    if not form.validate():
+        return None, {field: errors for field, errors in form.errors.items()}
+    values = {field: form[field].data for field in kind.fields}
+    if kind.derived:
+        values.update(kind.derived(form))
+    return values, None
+
+
+def _insert(kind, batch):
+    db.session.execute(sa.insert(kind.model), batch)
+    # Bulk inserts bypass the ORM flush hooks, so the summaries are fed directly
+    if kind.model is ExpenseReport:
+        expense_summary.record_rows(db.session.connection(), batch, sign=1)
+    elif kind.model is Task:
+        task_counts.record_rows(db.session.connection(), batch, sign=1)
+    db.session.commit()
+
+
+def import_rows(kind_name, stream, fmt, user_id):
+    # Valid rows are inserted BATCH_SIZE at a time, one transaction per batch; invalid rows
+    # are skipped and reported with their line number
+    kind = KINDS[kind_name]
+    inserted, errors, batch = 0, [], []
+    for line_number, row in read_rows(stream, fmt):
+        if not isinstance(row, dict):
+            values, row_errors = None, {'row': ['Not a valid record.']}
+        else:
+            values, row_errors = validate_row(kind, row)
+        if row_errors:
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'line': line_number, 'errors': row_errors})
+            continue
+        if 'user_id' in kind.model.__table__.c:
+            values['user_id'] = user_id
+        batch.append(values)
+        if len(batch) >= BATCH_SIZE:
+            _insert(kind, batch)
+            inserted += len(batch)
+            batch = []
+    if batch:
+        _insert(kind, batch)
+        inserted += len(batch)
+    return {'inserted': inserted, 'error_count': len(errors), 'errors': errors}
+
+
+def selected_ids(values):
+    # Ids from checkboxes or a JSON list, deduplicated in order
+    try:
+        ids = list(dict.fromkeys(int(value) for value in values))
+    except (TypeError, ValueError):
+        raise ValueError('ids must be integers')
+    if not ids:
+        raise ValueError('Nothing selected')
+    if len(ids) > MAX_SELECTED:
+        raise ValueError(f'Select at most {MAX_SELECTED} rows at a time')
+    return ids
+
+
+def _record_rows(kind, rows, sign):
+    # Set-based writes skip the flush hooks, so the summaries are fed the affected rows directly
+    if kind.model is ExpenseReport:
+        expense_summary.record_rows(db.session.connection(), rows, sign=sign)
+    elif kind.model is Task:
+        task_counts.record_rows(db.session.connection(), rows, sign=sign)
+
+
+def delete_rows(kind_name, ids, user_id):
+    # One DELETE ... RETURNING for the whole selection. Ids that do not exist or belong to
+    # another user come back as missing.
+    kind = KINDS[kind_name]
+    model = kind.model
+    statement = sa.delete(model).where(model.id.in_(ids), kind.owner(user_id))
+    rows = db.session.execute(statement.returning(*model.__table__.c)).mappings().all()
+    _record_rows(kind, rows, sign=-1)
+    db.session.commit()
+    deleted = {row['id'] for row in rows}
+    return {'deleted': sorted(deleted), 'missing': [id for id in ids if id not in deleted]}
+
+
+def update_status(kind_name, ids, status, user_id):
+    # One transaction: lock the selected rows the user owns, then move the ones not already
+    # in `status` with a single UPDATE ... WHERE id IN. Returns {id: 'updated' | 'unchanged'
+    # | 'not found'}; rows owned by someone else are 'not found', as on a single-item page.
+    kind = KINDS[kind_name]
+    model = kind.model
+    if status not in dict(kind.status_choices):
+        raise ValueError(f'Unknown status {status!r}')
+    before = db.session.execute(
+        sa.select(*model.__table__.c).where(model.id.in_(ids), kind.owner(user_id)).with_for_update()
+    ).mappings().all()
+    changing = [row for row in before if row['status'] != status]
+    if changing:
+        rows = db.session.execute(
+            sa.update(model).where(model.id.in_([row['id'] for row in changing]))
+            .values(status=status, updated_at=utcnow())
+            .returning(*model.__table__.c)
+        ).mappings().all()
+        _record_rows(kind, changing, sign=-1)
+        _record_rows(kind, rows, sign=1)
+    db.session.commit()
+    results = {id: 'not found' for id in ids}
+    results.update({row['id']: 'unchanged' for row in before})
+    results.update({row['id']: 'updated' for row in changing})
+    return results
+
+
+def json_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def export_rows(kind_name, fmt, user_id):
+    # Yields the export in chunks. Rows come through a server-side cursor in batches of
+    # BATCH_SIZE instead of a materialized .all(), so memory stays flat however large the table.
+    kind = KINDS[kind_name]
+    columns = ['id'] + kind.fields
+    statement = sa.select(*(getattr(kind.model, column) for column in columns)).order_by(kind.model.id)
+    if kind.owned:
+        statement = statement.where(kind.model.user_id == user_id)
+    result = db.session.execute(statement.execution_options(stream_results=True, yield_per=BATCH_SIZE))
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for partition in result.partitions():
+            writer.writerows(partition)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    elif fmt == 'jsonl':
+        for partition in result.partitions():
+            yield ''.join(json.dumps({column: json_value(value) for column, value in zip(columns, row)}) + '\n'
+                          for row in partition)
+    else:
+        raise ValueError(f'Unsupported format {fmt!r}; use csv or jsonl')
@@ -0,0 +1,46 @@
+import time
+import sqlalchemy as sa
+from flask import current_app
+from models import db, TrailSystem, Project
+from versions import table_version
+from replicas import primary_reads
+
+
+class ChoiceCache:
+    # (id, name) pairs for a SelectField, shared by every form in the process.
+    # Entries are rebuilt when the table's version changes, which any worker's insert,
+    # rename or delete does as it commits. CHOICE_CACHE_TTL is only a backstop.
+    def __init__(self, model):
+        self.model = model
+        self._entry = None  # (version, loaded_at, choices)
+
+    def _load(self):
+        limit = current_app.config['CHOICE_LIST_LIMIT']
+        with primary_reads(db.session):
+            rows = db.session.execute(
+                sa.select(self.model.id, self.model.name).order_by(self.model.id.desc()).limit(limit)
+            ).all()
+        return sorted(((row.id, row.name) for row in rows), key=lambda choice: choice[1].lower())
+
+    def get(self):
+        version = table_version(self.model.__tablename__)
+        entry = self._entry
+        if entry is None or entry[0] != version or time.monotonic() - entry[1] > current_app.config['CHOICE_CACHE_TTL']:
+            entry = (version, time.monotonic(), self._load())
+            self._entry = entry
+        return entry[2]
+
+    def including(self, value):
+        # The list is capped, so make sure a currently selected or submitted id that fell
+        # outside the cap is still a valid choice
+        choices = self.get()
+        if value is None or any(choice_id == value for choice_id, _ in choices):
+            return choices
+        row = db.session.execute(
+            sa.select(self.model.id, self.model.name).where(self.model.id == value)
+        ).first()
+        return choices + [(row.id, row.name)] if row else choices
+
+
+trail_system_choices = ChoiceCache(TrailSystem)
+project_choices = ChoiceCache(Project)
@@ -0,0 +1,145 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import secrets
+import time
+from flask import current_app
+from werkzeug.utils import secure_filename
+from storage import CHUNK_SIZE, store_stream
+
+ALLOWED_EXTENSIONS = {'.jpg', '.png', '.pdf'}
+UPLOAD_ID = re.compile(r'^[A-Za-z0-9_-]{22}$')
+INCOMING_DIR = 'incoming'
+
+
+class UploadError(Exception):
+    status_code = 400
+
+    def __init__(self, message, status_code=None, **extra):
+        super().__init__(message)
+        self.status_code = status_code or self.status_code
+        self.extra = extra
+
+
+def _incoming_folder():
+    folder = os.path.join(current_app.config['UPLOAD_FOLDER'], INCOMING_DIR)
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _paths(upload_id):
+    if not UPLOAD_ID.match(upload_id or ''):
+        raise UploadError('Unknown upload.', 404)
+    base = os.path.join(_incoming_folder(), upload_id)
+    return base + '.json', base + '.part'
+
+
+def _save_state(upload_id, state):
+    state_path, _ = _paths(upload_id)
+    with open(state_path + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(state_path + '.tmp', state_path)
+
+
+def load_state(upload_id, user_id):
+    state_path, _ = _paths(upload_id)
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        raise UploadError('Unknown upload.', 404)
+    if state['user_id'] != user_id:
+        raise UploadError('Unknown upload.', 404)
+    return state
+
+
+def start_upload(filename, size, user_id):
+    filename = secure_filename(filename or '')
+    if os.path.splitext(filename)[1].lower() not in ALLOWED_EXTENSIONS:
+        raise UploadError('Images and PDFs only!')
+    if not isinstance(size, int) or size <= 0:
+        raise UploadError('A positive file size is required.')
+    if size > current_app.config['MAX_MAP_UPLOAD_BYTES']:
+        raise UploadError('The file is larger than the maximum map size.', 413)
+
+    upload_id = secrets.token_urlsafe(16)
+    state = {'id': upload_id, 'filename': filename, 'size': size, 'offset': 0, 'user_id': user_id,
+             'name': None, 'created': time.time()}
+    open(_paths(upload_id)[1], 'wb').close()
+    _save_state(upload_id, state)
+    return state
+
+
+def append_chunk(upload_id, user_id, offset, stream, length, checksum):
+    # Appends one chunk at the acknowledged offset. The chunk is read from the request in
+    # small pieces, so memory stays bounded whatever the chunk size; if its SHA-256 does not
+    # match, the part file is cut back and the client resends from the same offset.
+    state = load_state(upload_id, user_id)
+    if state['name']:
+        return state
+    if length is None:
+        raise UploadError('Content-Length is required.', 411)
+    if length > current_app.config['MAX_CHUNK_BYTES']:
+        raise UploadError('Chunk is too large.', 413)
+
+    _, part_path = _paths(upload_id)
+    with open(part_path, 'r+b') as part:
+        # A client retrying over a bad link can send the same chunk twice at once
+        fcntl.flock(part, fcntl.LOCK_EX)
+        state = load_state(upload_id, user_id)
+        if state['name']:
+            return state
+        if offset != state['offset']:
+            raise UploadError('Chunk does not start at the current offset.', 409, offset=state['offset'])
+        if offset + length > state['size']:
+            raise UploadError('Chunk runs past the declared file size.', 413)
+
+        digest = hashlib.sha256()
+        written = 0
+        part.seek(offset)
+        while written < length:
+            piece = stream.read(min(CHUNK_SIZE, length - written))
+            if not piece:
+                break
+            digest.update(piece)
+            part.write(piece)
+            written += len(piece)
+        if written != length or (checksum and digest.hexdigest() != checksum.lower()):
+            part.truncate(offset)
+            raise UploadError('Chunk was incomplete or failed its checksum.', 422, offset=offset)
+        part.truncate(offset + written)
+
+        state['offset'] = offset + written
+        if state['offset'] == state['size']:
+            part.flush()
+            part.seek(0)
+            state['name'] = store_stream(part, state['filename'])
+            os.remove(part_path)
+        _save_state(upload_id, state)
+    return state
+
+
+def claim_upload(upload_id, user_id):
+    # Hands a finished upload to a trail system; returns the stored file name
+    state = load_state(upload_id, user_id)
+    if not state['name']:
+        raise UploadError('The map upload has not finished yet.', 409, offset=state['offset'])
+    os.remove(_paths(upload_id)[0])
+    return state['name']
+
+
+def prune_stale(max_age=86400):
+    removed = []
+    folder = _incoming_folder()
+    for entry in os.listdir(folder):
+        path = os.path.join(folder, entry)
+        if time.time() - os.path.getmtime(path) > max_age:
+            os.remove(path)
+            removed.append(entry)
+    return removed
+
+
+def public_state(state):
+    return {key: state[key] for key in ('id', 'filename', 'size', 'offset', 'name')}
@@ -0,0 +1,176 @@
+import json
+import sys
+import click
+
+
+def register_commands(app):
+    @app.cli.command('seed')
+    @click.option('--tasks', default=10000, show_default=True, help='Number of tasks; other tables scale from it.')
+    @click.option('--seed-value', default=42, show_default=True, help='Random seed for reproducible data.')
+    @click.option('--upgrade', is_flag=True, help='Apply pending migrations first (fresh local databases).')
+    def seed_command(tasks, seed_value, upgrade):
+        """Fill every table with synthetic trail crew data."""
+        from seed import seed
+        from schema import require_current_schema, upgrade_schema
+        if upgrade:
+            upgrade_schema()
+        require_current_schema()
+        seed(tasks=tasks, seed_value=seed_value, echo=click.echo)
+
+    @app.cli.command('bench')
+    @click.option('--requests', 'request_count', default=200, show_default=True, help='Timed requests per route.')
+    @click.option('--warmup', default=10, show_default=True, help='Untimed requests per route.')
+    @click.option('--route', 'routes', multiple=True, help='Route to benchmark; repeatable. Defaults to all pages.')
+    @click.option('--output', type=click.Path(), help='Write the JSON results to this file.')
+    @click.option('--baseline', type=click.Path(exists=True), help='Fail when results regress against this file.')
+    @click.option('--tolerance', default=0.2, show_default=True, help='Allowed p95 slowdown against the baseline.')
+    def bench_command(request_count, warmup, routes, output, baseline, tolerance):
+        """Benchmark the routes through the test client and report latency percentiles."""
+        from bench import run_benchmark, compare, load_results
+        results = run_benchmark(app, routes=list(routes), requests=request_count, warmup=warmup)
+        report = json.dumps(results, indent=2)
+        if output:
+            with open(output, 'w') as f:
+                f.write(report)
+        else:
+            click.echo(report)
+
+        if baseline:
+            regressions = compare(load_results(baseline), results, tolerance)
+            for line in regressions:
+                click.echo(f'REGRESSION {line}', err=True)
+            if regressions:
+                sys.exit(1)
+
+    @app.cli.command('startup-budget')
+    @click.option('--runs', default=5, show_default=True, help='Fresh processes to take the median over.')
+    @click.option('--route', default='/login', show_default=True, help='Route for the first request.')
+    @click.option('--import-budget-ms', type=float, help='Defaults to STARTUP_IMPORT_BUDGET_MS.')
+    @click.option('--first-request-budget-ms', type=float, help='Defaults to STARTUP_FIRST_REQUEST_BUDGET_MS.')
+    def startup_budget_command(runs, route, import_budget_ms, first_request_budget_ms):
+        """Fail if importing the app or its cold first request takes longer than the budget."""
+        from startup import measure
+        results = measure(app.root_path, route=route, runs=runs)
+        click.echo(json.dumps(results, indent=2))
+        budgets = {
+            'import_ms': import_budget_ms or app.config['STARTUP_IMPORT_BUDGET_MS'],
+            'first_request_ms': first_request_budget_ms or app.config['STARTUP_FIRST_REQUEST_BUDGET_MS'],
+        }
+        failures = [f'{key} {results[key]}ms > {budget}ms' for key, budget in budgets.items() if results[key] > budget]
+        if results['first_request_status'] >= 500:
+            failures.append(f'first request to {route} returned {results["first_request_status"]}')
+        for line in failures:
+            click.echo(f'OVER BUDGET {line}', err=True)
+        if failures:
+            sys.exit(1)
+
+    @app.cli.command('upgrade-schema')
+    def upgrade_schema_command():
+        """Create the schema on an empty database, or apply its pending migrations."""
+        from schema import upgrade_schema
+        upgrade_schema()
+        click.echo('database is at the migrations head')
+
+    @app.cli.command('check-migrations')
+    def check_migrations_command():
+        """Fail unless the database is at the latest migration."""
+        from schema import SchemaOutOfDate, require_current_schema
+        try:
+            require_current_schema()
+        except SchemaOutOfDate as e:
+            click.echo(str(e), err=True)
+            sys.exit(1)
+        click.echo('database is at the migrations head')
+
+    @app.cli.command('prune-uploads')
+    def prune_uploads_command():
+        """Delete abandoned chunked uploads and map files that no trail system references."""
+        from storage import prune_unreferenced
+        from chunked_uploads import prune_stale
+        for name in prune_stale() + prune_unreferenced():
+            click.echo(f'removed {name}')
+
+    @app.cli.command('check-query-plans')
+    @click.option('--verbose', is_flag=True, help='Print the full plan for every query.')
+    def check_query_plans_command(verbose):
+        """Fail if any hot query plans a full table scan (run against a migrated database)."""
+        from query_plans import check_query_plans
+        failed = False
+        for name, (plan, scans) in check_query_plans().items():
+            click.echo(f'{"FAIL" if scans else "ok  "} {name}')
+            for line in (plan if verbose else scans):
+                click.echo(f'       {line}')
+            failed = failed or bool(scans)
+        if failed:
+            sys.exit(1)
+
+    @app.cli.command('worker')
+    @click.option('--processes', default=None, type=int, help='Worker processes (default: CPU count).')
+    @click.option('--poll-interval', default=1.0, show_default=True, help='Seconds between polls when idle.')
+    @click.option('--burst', is_flag=True, help='Exit once no job is due.')
+    def worker_command(processes, poll_interval, burst):
+        """Run queued background jobs across a pool of processes."""
+        import os
+        from jobs import run_worker
+        run_worker(processes or os.cpu_count() or 1, poll_interval=poll_interval, burst=burst, echo=click.echo)
+
+    @app.cli.command('check-replicas')
+    def check_replicas_command():
+        """Report reachability and replication lag for each configured read replica."""
+        health = app.extensions.get('replica_health')
+        if health is None:
+            click.echo('no read replicas configured (set DATABASE_REPLICA_URLS)')
+            return
+        health.refresh(force=True)
+        replicas = health.stats()['replicas']
+        for key, state in replicas.items():
+            lag = 'unknown' if state['lag_seconds'] is None else f'{state["lag_seconds"]:.1f}s'
+            click.echo(f'{"ok  " if state["healthy"] else "FAIL"} {key} lag={lag} {state["error"] or ""}'.rstrip())
+        if not all(state['healthy'] for state in replicas.values()):
+            sys.exit(1)
+
+    @app.cli.command('rebuild-expense-summaries')
+    def rebuild_expense_summaries_command():
+        """Recompute the per-user monthly expense summaries from scratch."""
+        from expense_summary import rebuild
+        rebuild()
+        click.echo('expense summaries rebuilt')
+
+    @app.cli.command('rebuild-task-counts')
+    def rebuild_task_counts_command():
+        """Recompute the per-project task counts from scratch."""
+        from task_counts import rebuild
+        rebuild()
+        click.echo('task counts rebuilt')
+
+    @app.cli.command('import-rows')
+    @click.argument('kind', type=click.Choice(['equipment', 'tasks', 'expense_reports']))
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--user', 'username', required=True, help='User the imported rows belong to.')
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+    def import_rows_command(kind, path, username, fmt):
+        """Stream a CSV or JSONL file into equipment, tasks or expense reports."""
+        import os
+        from bulk import import_rows
+        from models import User
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            raise click.BadParameter(f'No user named {username}', param_hint='--user')
+        fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+        with open(path, 'rb') as f:
+            report = import_rows(kind, f, fmt, user.id)
+        for error in report['errors']:
+            click.echo(f'line {error["line"]}: {json.dumps(error["errors"])}', err=True)
+        click.echo(f'{report["inserted"]} rows imported, {report["error_count"]} rejected')
+
+    @app.cli.command('export-rows')
+    @click.argument('kind', type=click.Choice(['equipment', 'tasks', 'expense_reports']))
+    @click.option('--user', 'username', help='Owner to export expense reports for.')
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default='csv', show_default=True)
+    def export_rows_command(kind, username, fmt):
+        """Stream equipment, tasks or expense reports to stdout as CSV or JSONL."""
+        from bulk import export_rows
+        from models import User
+        user = User.query.filter_by(username=username).first() if username else None
+        for chunk in export_rows(kind, fmt, user.id if user else None):
+            click.echo(chunk, nl=False)
@@ -0,0 +1,69 @@
+import os
+
+
+class Config:
+    SECRET_KEY = os.getenv('SECRET_KEY')
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    UPLOAD_FOLDER = None  # defaults to static/uploads under the app root
+    PER_PAGE = 25  # Default page size for list views
+    MAX_PER_PAGE = 100  # Upper bound for the ?per_page= override
+    CHOICE_LIST_LIMIT = 500  # Most options a project/trail system dropdown will hold
+    CHOICE_CACHE_TTL = 300  # Seconds before cached dropdown options are reloaded even if unchanged
+    MAX_MAP_UPLOAD_BYTES = 200 * 1024 * 1024  # Largest map accepted through chunked uploads
+    MAX_CHUNK_BYTES = 4 * 1024 * 1024  # Largest single chunk
+
+    # Connection pool, per worker process. Size it so workers * (size + overflow) stays
+    # under the server's max_connections; /metrics shows checkout waits and saturation.
+    DB_POOL_SIZE = 5
+    DB_MAX_OVERFLOW = 10
+    DB_POOL_TIMEOUT = 10  # Seconds a request waits for a free connection before failing
+    DB_POOL_RECYCLE = 1800  # Seconds before a connection is replaced, ahead of server/proxy idle cutoffs
+    DB_POOL_PRE_PING = True  # Test connections on checkout so a restarted database isn't a 500
+    DB_STATEMENT_TIMEOUT_MS = 30000  # Postgres cancels any statement running longer than this
+
+    # Read replicas for GET traffic, comma-separated in DATABASE_REPLICA_URLS
+    SQLALCHEMY_REPLICA_URIS = [url for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url]
+    REPLICA_STICKY_SECONDS = 5  # Reads stay on the primary this long after a user writes
+    REPLICA_MAX_LAG_SECONDS = 10  # A replica further behind than this gets no traffic
+    REPLICA_CHECK_INTERVAL = 5  # Seconds between lag checks
+    REPLICA_CONNECT_TIMEOUT = 2  # Seconds before a connection attempt to a replica gives up
+
+    # `flask startup-budget` fails past these, medians over fresh processes. New workers
+    # take no traffic until both are paid, so they bound how fast the pool can scale out.
+    STARTUP_IMPORT_BUDGET_MS = 1000  # python -X importtime for `import wsgi`, app creation included
+    STARTUP_FIRST_REQUEST_BUDGET_MS = 250  # first request in a new process
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    JOBS_EAGER = True  # background jobs run in the web process; no worker needed locally
+    # Relative SQLite paths land in the app's instance/ folder; run `flask upgrade-schema` once
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///trail_management.db')
+    DB_MAX_OVERFLOW = 5
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SECRET_KEY = 'test'
+    SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URL', 'sqlite://')
+    WTF_CSRF_ENABLED = False
+    BCRYPT_LOG_ROUNDS = 4
+    JOBS_EAGER = True
+    DB_POOL_SIZE = 2
+    DB_MAX_OVERFLOW = 2
+    DB_POOL_TIMEOUT = 5
+    DB_STATEMENT_TIMEOUT_MS = 5000
+
+
+class ProductionConfig(Config):
+    DB_POOL_SIZE = 10
+    DB_MAX_OVERFLOW = 20
+    DB_STATEMENT_TIMEOUT_MS = 15000
+
+
+PROFILES = {
+    'dev': DevelopmentConfig,
+    'test': TestingConfig,
+    'prod': ProductionConfig,
+}
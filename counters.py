@@ -0,0 +1,50 @@
+import sqlalchemy as sa
+from sqlalchemy import inspect
+from sqlalchemy.dialects import postgresql, sqlite
+
+_INSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def apply_deltas(connection, table, key_columns, count_column, deltas):
+    # Adds {key tuple: {column: delta}} onto a summary table in place, one upsert per key,
+    # so concurrent writers add to the stored value instead of overwriting each other.
+    # Rows whose count drops to zero are removed.
+    deltas = {key: values for key, values in deltas.items() if any(values.values())}
+    if not deltas:
+        return
+    insert = _INSERTS[connection.dialect.name]
+    for key, values in deltas.items():
+        statement = insert(table).values(**dict(zip(key_columns, key)), **values)
+        statement = statement.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={column: table.c[column] + statement.excluded[column] for column in values},
+        )
+        connection.execute(statement)
+
+    connection.execute(sa.delete(table).where(
+        table.c[count_column] <= 0,
+        sa.tuple_(*(table.c[column] for column in key_columns)).in_(list(deltas)),
+    ))
+
+
+def previous_values(session, obj, names):
+    # Column values as of the last flush, for moving an object out of its old bucket. Old
+    # values come from attribute history; anything expired before the change is read back
+    # from the row as it is stored.
+    state = inspect(obj)
+    values, missing = {}, []
+    for name in names:
+        history = state.attrs[name].history
+        if history.deleted:
+            values[name] = history.deleted[0]
+        elif history.unchanged:
+            values[name] = history.unchanged[0]
+        else:
+            missing.append(name)
+    if missing:
+        model = type(obj)
+        row = session.execute(
+            sa.select(*(getattr(model, name) for name in missing)).where(model.id == obj.id)
+        ).one()
+        values.update(zip(missing, row))
+    return values
@@ -0,0 +1,86 @@
+import sqlite3
+import threading
+import time
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+from models import db
+
+
+class InstrumentedQueuePool(QueuePool):
+    # QueuePool that times every checkout. Long checkouts mean requests are queueing for a
+    # connection; saturation is checked-out connections over the most the pool may open.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_seconds = 0.0
+        self.max_checkout_seconds = 0.0
+        self.timeouts = 0
+        self.peak_checked_out = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except sa.exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        waited = time.perf_counter() - started
+        with self._stats_lock:
+            self.checkouts += 1
+            self.checkout_seconds += waited
+            self.max_checkout_seconds = max(self.max_checkout_seconds, waited)
+            self.peak_checked_out = max(self.peak_checked_out, self.checkedout())
+        return connection
+
+    def stats(self):
+        capacity = self.size() + self._max_overflow
+        with self._stats_lock:
+            return {
+                'size': self.size(),
+                'max_overflow': self._max_overflow,
+                'checked_out': self.checkedout(),
+                'overflow': max(self.overflow(), 0),
+                'saturation': round(self.checkedout() / capacity, 3) if capacity > 0 else None,
+                'peak_saturation': round(self.peak_checked_out / capacity, 3) if capacity > 0 else None,
+                'checkouts': self.checkouts,
+                'avg_checkout_ms': round(self.checkout_seconds * 1000 / self.checkouts, 3) if self.checkouts else 0,
+                'max_checkout_ms': round(self.max_checkout_seconds * 1000, 3),
+                'timeouts': self.timeouts,
+            }
+
+
+def engine_options(config, url=None):
+    url = sa.engine.make_url(url or config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return {}  # Flask-SQLAlchemy gives in-memory SQLite a single static connection
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    if url.get_backend_name() == 'postgresql' and config['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {'options': f"-c statement_timeout={int(config['DB_STATEMENT_TIMEOUT_MS'])}"}
+    return options
+
+
+@event.listens_for(sa.engine.Engine, 'connect')
+def _sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores FOREIGN KEY clauses, ON DELETE CASCADE included, unless each
+    # connection turns them on
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+
+def pool_stats():
+    pool = db.engine.pool
+    if isinstance(pool, InstrumentedQueuePool):
+        return pool.stats()
+    return {'status': pool.status()}
@@ -0,0 +1,118 @@
+import datetime
+from decimal import Decimal
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from counters import apply_deltas, previous_values
+from models import db, ExpenseReport, ExpenseSummary
+
+KEY_COLUMNS = ['user_id', 'month', 'status']
+TRACKED = ('user_id', 'date_submitted', 'status', 'amount')
+
+
+def month_of(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.date.fromisoformat(value[:10])
+    return datetime.date(value.year, value.month, 1)
+
+
+def summary_key(user_id, date_submitted, status):
+    month = month_of(date_submitted)
+    if user_id is None or month is None:
+        return None  # undated reports can't be bucketed by month
+    return (user_id, month, status or 'unknown')
+
+
+def add_delta(deltas, key, sign, amount):
+    # sign is +1 for a report entering the bucket and -1 for one leaving it
+    if key is None:
+        return
+    entry = deltas.setdefault(key, {'report_count': 0, 'total_amount': Decimal('0')})
+    entry['report_count'] += sign
+    entry['total_amount'] += sign * Decimal(amount or 0)
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_deltas(session, flush_context, instances):
+    deltas = session.info.setdefault('expense_summary_deltas', {})
+    for report in session.new:
+        if isinstance(report, ExpenseReport):
+            add_delta(deltas, summary_key(report.user_id, report.date_submitted, report.status), 1, report.amount)
+    for report in session.deleted:
+        if isinstance(report, ExpenseReport):
+            old = previous_values(session, report, TRACKED)
+            add_delta(deltas, summary_key(old['user_id'], old['date_submitted'], old['status']), -1, old['amount'])
+    for report in session.dirty:
+        if isinstance(report, ExpenseReport) and session.is_modified(report):
+            old = previous_values(session, report, TRACKED)
+            add_delta(deltas, summary_key(old['user_id'], old['date_submitted'], old['status']), -1, old['amount'])
+            add_delta(deltas, summary_key(report.user_id, report.date_submitted, report.status), 1, report.amount)
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_deltas(session, flush_context):
+    # Same connection and transaction as the report rows, so both commit or neither does
+    deltas = session.info.pop('expense_summary_deltas', None)
+    if deltas:
+        apply_deltas(session.connection(), ExpenseSummary.__table__, KEY_COLUMNS, 'report_count', deltas)
+
+
+def record_rows(connection, rows, sign):
+    # For set-based inserts and deletes that never pass through the flush hooks above
+    deltas = {}
+    for row in rows:
+        add_delta(deltas, summary_key(row['user_id'], row['date_submitted'], row['status']), sign, row['amount'])
+    apply_deltas(connection, ExpenseSummary.__table__, KEY_COLUMNS, 'report_count', deltas)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_deltas(session):
+    session.info.pop('expense_summary_deltas', None)
+
+
+def month_expression(dialect_name, column):
+    if dialect_name == 'postgresql':
+        return sa.cast(sa.func.date_trunc('month', column), sa.Date)
+    return sa.func.date(column, 'start of month')
+
+
+def rebuild():
+    # Recomputes every summary row from expense_reports in one set-based statement
+    reports = ExpenseReport.__table__
+    month = month_expression(db.engine.dialect.name, reports.c.date_submitted)
+    source = sa.select(
+        reports.c.user_id, month, sa.func.coalesce(reports.c.status, 'unknown'),
+        sa.func.count(), sa.func.coalesce(sa.func.sum(reports.c.amount), 0),
+    ).where(reports.c.date_submitted.isnot(None)).group_by(
+        reports.c.user_id, month, sa.func.coalesce(reports.c.status, 'unknown'))
+    db.session.execute(sa.delete(ExpenseSummary))
+    db.session.execute(sa.insert(ExpenseSummary).from_select(
+        ['user_id', 'month', 'status', 'report_count', 'total_amount'], source))
+    db.session.commit()
+
+
+def summary_for(user_id, months=24):
+    # Reads only the summary rows: cost grows with months shown, not reports filed
+    today = datetime.date.today()
+    first = today.year * 12 + today.month - months  # month index of the oldest month shown
+    since = datetime.date(first // 12, first % 12 + 1, 1)
+    rows = db.session.execute(
+        sa.select(ExpenseSummary.month, ExpenseSummary.status, ExpenseSummary.report_count,
+                  ExpenseSummary.total_amount)
+        .where(ExpenseSummary.user_id == user_id, ExpenseSummary.month >= since)
+        .order_by(ExpenseSummary.month.desc(), ExpenseSummary.status)
+    ).all()
+
+    by_month = {}
+    for row in rows:
+        month = by_month.setdefault(row.month, {'month': row.month.isoformat(), 'report_count': 0,
+                                                'total_amount': Decimal('0'), 'by_status': {}})
+        month['report_count'] += row.report_count
+        month['total_amount'] += Decimal(row.total_amount)
+        month['by_status'][row.status] = {'report_count': row.report_count,
+                                          'total_amount': str(row.total_amount)}
+    for month in by_month.values():
+        month['total_amount'] = str(month['total_amount'])
+    return list(by_month.values())
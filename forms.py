@@ -1,8 +1,9 @@
 from flask_wtf import FlaskForm
-from models import TrailSystem, Project
-from wtforms import StringField, IntegerField, TextAreaField, SubmitField, DateField, SelectField, DecimalField, PasswordField
-from wtforms.validators import DataRequired, Email, EqualTo
-from flask_wtf.file import FileField, FileRequired, FileAllowed
+from choices import trail_system_choices, project_choices
+from maintenance import parse_schedule, InvalidSchedule
+from wtforms import HiddenField, StringField, IntegerField, TextAreaField, SubmitField, DateField, SelectField, DecimalField, PasswordField
+from wtforms.validators import DataRequired, Email, EqualTo, ValidationError
+from flask_wtf.file import FileField, FileAllowed
 
 class ProjectForm(FlaskForm):
     name = StringField('Name', validators=[DataRequired()])
@@ -13,7 +14,7 @@ class ProjectForm(FlaskForm):
 
     def __init__(self, *args, **kwargs):
         super(ProjectForm, self).__init__(*args, **kwargs)
-        self.trail_system_id.choices = [(ts.id, ts.name) for ts in TrailSystem.query.all()]
+        self.trail_system_id.choices = trail_system_choices.including(self.trail_system_id.data)
 
 class TaskForm(FlaskForm):
     name = StringField('Name', validators=[DataRequired()])
@@ -24,24 +25,34 @@ class TaskForm(FlaskForm):
 
     def __init__(self, *args, **kwargs):
         super(TaskForm, self).__init__(*args, **kwargs)
-        self.project_id.choices = [(p.id, p.name) for p in Project.query.all()]
+        self.project_id.choices = project_choices.including(self.project_id.data)
 
 class TrailSystemForm(FlaskForm):
     name = StringField('Name', validators=[DataRequired()])
     location = StringField('Location', validators=[DataRequired()])
     description = TextAreaField('Description', validators=[DataRequired()])
-    map = FileField('Upload Map', validators=[FileRequired(), FileAllowed(['jpg', 'png', 'pdf'], 'Images and PDFs only!')])
+    map = FileField('Upload Map', validators=[FileAllowed(['jpg', 'png', 'pdf'], 'Images and PDFs only!')])
+    upload_id = HiddenField()  # set instead of map when the file was sent through the chunked upload API
     submit = SubmitField('Submit')
 
+    def validate(self, extra_validators=None):
+        if not super(TrailSystemForm, self).validate(extra_validators):
+            return False
+        if not self.map.data and not self.upload_id.data:
+            self.map.errors.append('This field is required.')
+            return False
+        return True
+
 class EditTrailSystemForm(FlaskForm):
     name = StringField('Name', validators=[DataRequired()])
     location = StringField('Location', validators=[DataRequired()])
     description = TextAreaField('Description', validators=[DataRequired()])
     map = FileField('Upload Map', validators=[FileAllowed(['jpg', 'png', 'pdf'], 'Images and PDFs only!')])
+    upload_id = HiddenField()
     submit = SubmitField('Submit')
 
 class ExpenseReportForm(FlaskForm):
-    date_submitted = StringField('Date', validators=[DataRequired()], render_kw={'type': 'date'})  # For input type date
+    date_submitted = DateField('Date', validators=[DataRequired()], format='%Y-%m-%d', render_kw={'type': 'date'})  # For input type date
     amount = DecimalField('Amount', validators=[DataRequired()])  # Decimal for currency
     expense_details = TextAreaField('Details', validators=[DataRequired()])
     status = SelectField('Status', choices=[('submitted', 'Submitted'), ('approved', 'Approved'), ('denied', 'Denied')]) 
@@ -51,9 +62,17 @@ class EquipmentForm(FlaskForm):
     name = StringField('Name', validators=[DataRequired()])
     description = TextAreaField('Description', validators=[DataRequired()])
     status = SelectField('Status', choices=[('active', 'Active'), ('maintenance', 'Maintenance'), ('out of order', 'Out of Order')]) 
-    maintenance_schedule = StringField('Maintenance Schedule', validators=[DataRequired()])
+    maintenance_schedule = StringField('Maintenance Schedule', validators=[DataRequired()],
+                                       description='e.g. "every 3 months", "every 90 days" or "weekly"')
     submit = SubmitField('Submit')
 
+    def validate_maintenance_schedule(self, field):
+        # Parsed once here; views store the (interval, unit) pair, never the raw text
+        try:
+            self.maintenance_rule = parse_schedule(field.data)
+        except InvalidSchedule as e:
+            raise ValidationError(str(e))
+
 class UserProfileForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired()])
     email = StringField('Email', validators=[DataRequired(), Email()])
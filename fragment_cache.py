@@ -0,0 +1,157 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, request
+from markupsafe import Markup
+import metrics
+import versions
+from models import db
+from replicas import primary_reads
+
+
+class LocalFragmentCache:
+    # Rendered HTML in this process, least recently used evicted first once the stored
+    # fragments pass max_bytes
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # key -> (expires_at, html)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, html, ttl):
+        size = len(html.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, html)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, html = self._entries.pop(key)
+        self.size -= len(html.encode('utf-8'))
+
+    def stats(self):
+        return {'entries': len(self._entries), 'bytes': self.size, 'evictions': self.evictions}
+
+
+class SharedFragmentCache:
+    # One file per fragment in a directory shared by every worker on the host, standing in
+    # for memcached or Redis. File mtimes are the LRU order; a sweep trims the directory
+    # back under max_bytes after every sweep_every stores.
+    def __init__(self, directory, max_bytes, sweep_every=100):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.sweep_every = sweep_every
+        self.evictions = 0
+        self._stores = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + '.html')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                html = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return html
+
+    def set(self, key, html, ttl):
+        # No expiry needed: keys carry the table versions
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.replace(temp_path, self._path(key))
+        self._stores += 1
+        if self._stores % self.sweep_every == 0:
+            self.sweep()
+
+    def sweep(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.html'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+
+    def stats(self):
+        return {'directory': self.directory, 'evictions': self.evictions}
+
+
+class FragmentCache:
+    def __init__(self):
+        self.backend = None
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        app.config.setdefault('FRAGMENT_CACHE', True)
+        app.config.setdefault('FRAGMENT_CACHE_MAX_BYTES', 16 * 1024 * 1024)
+        app.config.setdefault('FRAGMENT_CACHE_TTL', 300)  # frees memory held by fragments no key points at any more
+        app.config.setdefault('FRAGMENT_CACHE_DIR', None)
+        if app.config['FRAGMENT_CACHE_DIR']:
+            self.backend = SharedFragmentCache(os.path.join(app.config['FRAGMENT_CACHE_DIR'], 'fragments'),
+                                               app.config['FRAGMENT_CACHE_MAX_BYTES'])
+        else:
+            self.backend = LocalFragmentCache(app.config['FRAGMENT_CACHE_MAX_BYTES'])
+        metrics.register('fragment_cache', self.stats)
+
+    def cached(self, name, tables, render):
+        # Returns render() for this view and query string, reusing the HTML until one of the
+        # tables it was built from changes. The versions are read from the database, so a
+        # write committed by any worker misses on the next request everywhere. A hit costs
+        # that one lookup and no template rendering.
+        if not current_app.config['FRAGMENT_CACHE']:
+            return Markup(render())
+        stamp = ','.join(f'{table}@{version}' for table, (version, _) in versions.table_versions(*tables).items())
+        key = f'{name}|{stamp}|{request.query_string.decode()}'
+        html = self.backend.get(key)
+        if html is None:
+            self.misses += 1
+            with primary_reads(db.session):
+                html = render()
+            self.backend.set(key, html, current_app.config['FRAGMENT_CACHE_TTL'])
+        else:
+            self.hits += 1
+        return Markup(html)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, **self.backend.stats()}
+
+
+fragment_cache = FragmentCache()
@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import OrderedDict
+import sqlalchemy as sa
+from flask_login import UserMixin
+import metrics
+from models import db, User
+
+
+class Identity(UserMixin):
+    # What current_user needs to be: the id and a display name, not the whole users row
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+
+class IdentityCache:
+    # user id -> Identity for the login_manager user loader, so an authenticated request
+    # does not pay a query to rebuild current_user. Every write to a user invalidates that
+    # one entry in the worker making it; in the others, IDENTITY_CACHE_TTL bounds how long
+    # the old username can show. The least recently used entry is dropped past
+    # IDENTITY_CACHE_SIZE.
+    def __init__(self):
+        self._entries = OrderedDict()  # user id -> (expires_at, identity)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        app.config.setdefault('IDENTITY_CACHE_SIZE', 1024)
+        app.config.setdefault('IDENTITY_CACHE_TTL', 60)
+        self.max_size = app.config['IDENTITY_CACHE_SIZE']
+        self.ttl = app.config['IDENTITY_CACHE_TTL']
+        metrics.register('identity_cache', self.stats)
+
+    def load(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        row = db.session.execute(sa.select(User.id, User.username).where(User.id == user_id)).first()
+        if row is None:
+            self.invalidate(user_id)
+            return None
+        identity = Identity(row.id, row.username)
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, identity)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return identity
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+identity_cache = IdentityCache()
@@ -0,0 +1,145 @@
+import heapq
+import json
+import logging
+import time
+from functools import wraps
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+slow_query_log = logging.getLogger('sql.slow')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestSQLStats:
+    def __init__(self, keep_slowest):
+        self.count = 0
+        self.total = 0.0
+        self.keep_slowest = keep_slowest
+        self._slowest = []  # min-heap of (duration, statement), bounded by keep_slowest
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.total += duration
+        if len(self._slowest) < self.keep_slowest:
+            heapq.heappush(self._slowest, (duration, statement))
+        elif self._slowest and duration > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, (duration, statement))
+
+    @property
+    def slowest(self):
+        return sorted(self._slowest, reverse=True)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info['query_start'].pop()
+    if not has_request_context():
+        return
+    stats = request_stats()
+    stats.record(statement, duration)
+
+    threshold = current_app.config['SLOW_QUERY_MS']
+    if threshold is not None and duration * 1000 >= threshold:
+        slow_query_log.warning(json.dumps({
+            'event': 'slow_query',
+            'duration_ms': round(duration * 1000, 2),
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.path,
+            'statement': statement[:1000],
+        }))
+
+
+def _handle_error(exception_context):
+    # The matching after_cursor_execute never fires for a failed statement
+    starts = exception_context.connection.info.get('query_start') if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+def per_request(app, name):
+    # Drops g.<name> as each request starts. g belongs to the app context, which outlives
+    # the request when an outer one is already pushed (CLI, tests).
+    app.before_request(lambda: g.pop(name, None))
+
+
+def request_stats():
+    if 'sql_stats' not in g:
+        g.sql_stats = RequestSQLStats(current_app.config['SQL_SLOWEST_TRACKED'])
+    return g.sql_stats
+
+
+def query_count():
+    return g.sql_stats.count if 'sql_stats' in g else 0
+
+
+def _finish_request(response):
+    # Sent even when no SQL ran (a cache hit), so a count of 0 is measured rather than missing
+    stats = request_stats()
+    response.headers.add('Server-Timing', f'db;dur={stats.total * 1000:.2f};desc="{stats.count} queries"')
+
+    # Requests whose combined SQL time crosses the threshold log their worst statements,
+    # which catches pages that are slow because of many individually fast queries.
+    threshold = current_app.config['SLOW_QUERY_MS']
+    if threshold is not None and stats.total * 1000 >= threshold:
+        slow_query_log.warning(json.dumps({
+            'event': 'slow_request',
+            'total_ms': round(stats.total * 1000, 2),
+            'query_count': stats.count,
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.path,
+            'slowest': [{'duration_ms': round(d * 1000, 2), 'statement': s[:1000]} for d, s in stats.slowest],
+        }))
+    return response
+
+
+def init_sql_instrumentation(app, db):
+    # Listeners hang off the engines owned by the shared `db` object, so every query the
+    # app issues is counted and timed. Per query this is two perf_counter() calls and a
+    # bounded heap push, which is cheap enough to leave on in production.
+    app.config.setdefault('SQL_INSTRUMENTATION', True)
+    app.config.setdefault('SLOW_QUERY_MS', 200)
+    app.config.setdefault('SQL_SLOWEST_TRACKED', 3)
+    app.config.setdefault('SLOW_QUERY_LOG', None)  # optional file path, one JSON object per line
+    app.config.setdefault('LIST_QUERY_BUDGET', 5)
+    if not app.config['SQL_INSTRUMENTATION']:
+        return
+
+    if app.config['SLOW_QUERY_LOG']:
+        handler = logging.FileHandler(app.config['SLOW_QUERY_LOG'])
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        slow_query_log.addHandler(handler)
+        slow_query_log.setLevel(logging.WARNING)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(engine, 'handle_error', _handle_error)
+    per_request(app, 'sql_stats')
+    app.after_request(_finish_request)
+
+
+def query_budget(max_queries=None):
+    # Fails the request in test mode when a view issues more queries than allowed,
+    # which catches N+1 loads regardless of how many rows the page renders.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response = view(*args, **kwargs)
+            if current_app.config.get('ENFORCE_QUERY_BUDGET', current_app.testing):
+                budget = max_queries or current_app.config['LIST_QUERY_BUDGET']
+                if query_count() > budget:
+                    raise QueryBudgetExceeded(
+                        f'{view.__name__} issued {query_count()} queries (budget {budget})')
+            return response
+        wrapper.query_budget = max_queries  # lets tests find every budgeted view
+        return wrapper
+    return decorator
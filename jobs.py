@@ -0,0 +1,253 @@
+import datetime
+import logging
+import multiprocessing
+import random
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+import metrics
+from models import db, Job, utcnow
+
+log = logging.getLogger(__name__)
+
+# Job name -> function. Functions run inside an app context and take the payload as
+# keyword arguments; the return value must be JSON-serialisable.
+JOBS = {}
+
+
+def job(name):
+    def register(fn):
+        JOBS[name] = fn
+        return fn
+    return register
+
+
+def init_jobs(app):
+    app.config.setdefault('JOBS_EAGER', False)  # run jobs in this process after commit, no worker needed
+    app.config.setdefault('JOBS_MAX_ATTEMPTS', 5)
+    app.config.setdefault('JOBS_RETRY_BACKOFF', 5)  # seconds before the first retry, doubled per attempt
+    app.config.setdefault('JOBS_MAX_BACKOFF', 3600)
+    app.config.setdefault('JOBS_VISIBILITY_TIMEOUT', 300)  # a claimed job silent this long is handed out again
+    metrics.register('jobs', stats)
+
+
+def enqueue(job_name, /, *, idempotency_key=None, delay=0, max_attempts=None, owner_id=None, **payload):
+    # Adds the job to the current transaction, so it is only visible to workers once the
+    # caller commits and never runs for work that was rolled back. A job with the same
+    # idempotency key that is still queued or running is returned instead of a new one.
+    # Only the owner can read the job's status through /jobs/<id>.
+    if job_name not in JOBS:
+        raise KeyError(f'Unknown job {job_name!r}')
+    if idempotency_key:
+        existing = Job.query.filter_by(idempotency_key=idempotency_key).first()
+        if existing is not None:
+            return existing
+    new_job = Job(name=job_name, payload=payload, user_id=owner_id, idempotency_key=idempotency_key,
+                  max_attempts=max_attempts or current_app.config['JOBS_MAX_ATTEMPTS'],
+                  run_at=utcnow() + datetime.timedelta(seconds=delay))
+    try:
+        with db.session.begin_nested():
+            db.session.add(new_job)
+    except IntegrityError:
+        # Lost a race with another request enqueuing the same key
+        return Job.query.filter_by(idempotency_key=idempotency_key).one()
+    if current_app.config['JOBS_EAGER']:
+        db.session.info.setdefault('eager_jobs', []).append(new_job)
+    return new_job
+
+
+def claim(limit, visibility_timeout):
+    # Marks up to `limit` due jobs as running in one UPDATE. Jobs whose lease ran out
+    # (worker died mid-job) are due again. SKIP LOCKED lets several workers claim at once
+    # on Postgres; SQLite serialises writers anyway.
+    now = utcnow()
+    due = (
+        sa.select(Job.id)
+        .where(sa.or_(
+            sa.and_(Job.status == 'queued', Job.run_at <= now),
+            sa.and_(Job.status == 'running', Job.locked_until < now),
+        ))
+        .order_by(Job.run_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    rows = db.session.execute(
+        sa.update(Job)
+        .where(Job.id.in_(due.scalar_subquery()))
+        .values(status='running', attempts=Job.attempts + 1, started_at=now,
+                locked_until=now + datetime.timedelta(seconds=visibility_timeout))
+        .returning(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts)
+    ).all()
+    db.session.commit()
+    return rows
+
+
+def extend_leases(job_ids, visibility_timeout):
+    if job_ids:
+        db.session.execute(sa.update(Job).where(Job.id.in_(job_ids), Job.status == 'running').values(
+            locked_until=utcnow() + datetime.timedelta(seconds=visibility_timeout)))
+        db.session.commit()
+
+
+def backoff(attempts):
+    # Exponential with +/-20% jitter, so a burst of failures does not retry in lockstep
+    delay = min(current_app.config['JOBS_RETRY_BACKOFF'] * 2 ** (attempts - 1), current_app.config['JOBS_MAX_BACKOFF'])
+    return delay * random.uniform(0.8, 1.2)
+
+
+def finish(claimed, result=None, error=None):
+    now = utcnow()
+    values = {'locked_until': None, 'finished_at': now}
+    if error is None:
+        values.update(status='succeeded', result=result, idempotency_key=None)
+    elif claimed.attempts < claimed.max_attempts:
+        values.update(status='queued', last_error=error, finished_at=None,
+                      run_at=now + datetime.timedelta(seconds=backoff(claimed.attempts)))
+    else:
+        values.update(status='failed', last_error=error, idempotency_key=None)
+    db.session.execute(sa.update(Job).where(Job.id == claimed.id).values(**values))
+    db.session.commit()
+    return values
+
+
+def execute(name, payload):
+    # Runs one job in the current process. Errors come back as text, so nothing that
+    # fails to pickle has to cross the process boundary.
+    try:
+        return JOBS[name](**payload), None
+    except Exception:
+        db.session.rollback()
+        return None, traceback.format_exc(limit=20)
+
+
+# --- Worker: claims in the parent, runs each job in a child process ---
+
+_worker_app = None
+
+
+def _init_child():
+    # Forked children share the parent's pooled sockets; drop them without closing
+    with _worker_app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def _run_in_child(name, payload):
+    with _worker_app.app_context():
+        return execute(name, payload)
+
+
+def run_worker(processes, poll_interval=1.0, burst=False, echo=print):
+    global _worker_app
+    _worker_app = current_app._get_current_object()
+    visibility_timeout = current_app.config['JOBS_VISIBILITY_TIMEOUT']
+    in_flight = {}  # future -> claimed row
+    last_lease = time.monotonic()
+    done = 0
+    started = time.monotonic()
+    with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('fork'),
+                             initializer=_init_child) as pool:
+        while True:
+            free = processes - len(in_flight)
+            if free:
+                for claimed in claim(free, visibility_timeout):
+                    if claimed.attempts > claimed.max_attempts:
+                        finish(claimed, error='Lease expired on the final attempt')
+                        continue
+                    in_flight[pool.submit(_run_in_child, claimed.name, claimed.payload)] = claimed
+            if not in_flight:
+                if burst:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            finished, _ = wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in finished:
+                claimed = in_flight.pop(future)
+                try:
+                    result, error = future.result()
+                except Exception:
+                    result, error = None, traceback.format_exc(limit=20)  # the child process died
+                finish(claimed, result=result, error=error)
+                done += 1
+                echo(f'{"ok  " if error is None else "FAIL"} job {claimed.id} {claimed.name} '
+                     f'attempt {claimed.attempts}/{claimed.max_attempts}')
+            if time.monotonic() - last_lease > visibility_timeout / 3:
+                extend_leases([claimed.id for claimed in in_flight.values()], visibility_timeout)
+                last_lease = time.monotonic()
+    elapsed = time.monotonic() - started
+    echo(f'{done} jobs in {elapsed:.1f}s ({done / elapsed if elapsed else 0:.1f}/s)')
+
+
+# --- Eager mode: run the transaction's jobs on a local thread once it commits ---
+
+_eager_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='jobs')
+
+
+def _run_eager(app, job_id):
+    with app.app_context():
+        claimed = db.session.execute(
+            sa.update(Job).where(Job.id == job_id, Job.status == 'queued')
+            .values(status='running', attempts=Job.attempts + 1, started_at=utcnow())
+            .returning(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts)
+        ).first()
+        db.session.commit()
+        if claimed is not None:
+            result, error = execute(claimed.name, claimed.payload)
+            if error:
+                log.error('Job %s %s failed: %s', claimed.id, claimed.name, error)
+            values = finish(claimed, result=result, error=error)
+            if values['status'] == 'queued':
+                delay = max((values['run_at'] - utcnow()).total_seconds(), 0)
+                threading.Timer(delay, _eager_executor.submit, (_run_eager, app, job_id)).start()
+
+
+@event.listens_for(Session, 'after_commit')
+def _submit_eager_jobs(session):
+    pending = session.info.pop('eager_jobs', None)
+    if pending:
+        app = current_app._get_current_object()
+        for pending_job in pending:
+            _eager_executor.submit(_run_eager, app, pending_job.id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_eager_jobs(session):
+    session.info.pop('eager_jobs', None)
+
+
+def public_state(job_row):
+    return {
+        'id': job_row.id,
+        'name': job_row.name,
+        'status': job_row.status,
+        'attempts': job_row.attempts,
+        'max_attempts': job_row.max_attempts,
+        'run_at': job_row.run_at.isoformat() if job_row.run_at else None,
+        'finished_at': job_row.finished_at.isoformat() if job_row.finished_at else None,
+        'last_error': job_row.last_error.strip().splitlines()[-1] if job_row.last_error else None,
+        'result': job_row.result,
+    }
+
+
+def stats():
+    # Counts by status plus completions in the last minute, read from the jobs table so
+    # every worker's throughput is included
+    counts = dict(db.session.execute(sa.select(Job.status, sa.func.count()).group_by(Job.status)).all())
+    since = utcnow() - datetime.timedelta(minutes=1)
+    recent = db.session.execute(
+        sa.select(Job.started_at, Job.finished_at)
+        .where(Job.status == 'succeeded', Job.finished_at >= since)
+    ).all()
+    durations = [(finished - started).total_seconds() for started, finished in recent if started and finished]
+    return {
+        'by_status': counts,
+        'succeeded_last_minute': len(recent),
+        'avg_duration_ms': round(sum(durations) * 1000 / len(durations), 1) if durations else None,
+    }
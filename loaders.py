@@ -0,0 +1,16 @@
+from sqlalchemy.orm import joinedload, selectinload
+from models import User, Project
+
+# Loader options per view, so templates that walk relationships get them in a
+# fixed number of queries instead of one SELECT per row.
+# Many-to-one lookups use a JOIN; one-to-many collections use a single IN query.
+# Built lazily because backref attributes only exist once the mappers are configured.
+EAGER_LOADS = {
+    'projects': lambda: (joinedload(Project.trail_system),),
+    'user_profile': lambda: (selectinload(User.projects),),
+}
+
+
+def eager(query, view):
+    options = EAGER_LOADS.get(view)
+    return query.options(*options()) if options else query
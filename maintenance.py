@@ -0,0 +1,83 @@
+import calendar
+import datetime
+import re
+
+UNITS = ('day', 'week', 'month', 'year')
+
+# Words people already type into the schedule field
+ALIASES = {
+    'daily': (1, 'day'),
+    'weekly': (1, 'week'),
+    'biweekly': (2, 'week'),
+    'fortnightly': (2, 'week'),
+    'monthly': (1, 'month'),
+    'quarterly': (3, 'month'),
+    'semiannually': (6, 'month'),
+    'yearly': (1, 'year'),
+    'annually': (1, 'year'),
+}
+UNIT_WORDS = {
+    'd': 'day', 'day': 'day', 'days': 'day',
+    'w': 'week', 'wk': 'week', 'wks': 'week', 'week': 'week', 'weeks': 'week',
+    'mo': 'month', 'mos': 'month', 'month': 'month', 'months': 'month',
+    'y': 'year', 'yr': 'year', 'yrs': 'year', 'year': 'year', 'years': 'year',
+}
+RULE = re.compile(r'^(?:every\s+)?(?:(\d+)\s*)?([a-z]+)$')
+MAX_INTERVAL = {'day': 3650, 'week': 520, 'month': 120, 'year': 10}
+
+
+class InvalidSchedule(ValueError):
+    pass
+
+
+def parse_schedule(text):
+    # "every 3 months", "monthly", "90 days" -> (3, 'month'), (1, 'month'), (90, 'day')
+    cleaned = ' '.join((text or '').lower().replace('-', ' ').split())
+    if cleaned.replace(' ', '') in ALIASES:
+        return ALIASES[cleaned.replace(' ', '')]
+    match = RULE.match(cleaned)
+    unit = UNIT_WORDS.get(match.group(2)) if match else None
+    if unit is None:
+        raise InvalidSchedule('Use a schedule like "every 3 months", "every 90 days" or "weekly".')
+    interval = int(match.group(1) or 1)
+    if not 1 <= interval <= MAX_INTERVAL[unit]:
+        raise InvalidSchedule(f'Pick between 1 and {MAX_INTERVAL[unit]} {unit}s.')
+    return interval, unit
+
+
+def format_schedule(interval, unit):
+    return f'every {unit}' if interval == 1 else f'every {interval} {unit}s'
+
+
+def advance(start, interval, unit):
+    # Calendar-aware: a month after Jan 31 is the last day of February
+    if unit == 'day':
+        return start + datetime.timedelta(days=interval)
+    if unit == 'week':
+        return start + datetime.timedelta(weeks=interval)
+    months = interval * (12 if unit == 'year' else 1)
+    month_index = start.month - 1 + months
+    year, month = start.year + month_index // 12, month_index % 12 + 1
+    return start.replace(year=year, month=month, day=min(start.day, calendar.monthrange(year, month)[1]))
+
+
+def schedule_columns(interval, unit, last_maintained_at, now):
+    # Values for the structured schedule columns; next_due counts from the last service,
+    # or from now for equipment that has never been serviced
+    return {
+        'maintenance_schedule': format_schedule(interval, unit),
+        'maintenance_interval': interval,
+        'maintenance_unit': unit,
+        'next_due': advance(last_maintained_at or now, interval, unit),
+    }
+
+
+def due_equipment(days, now, limit=200):
+    # Overdue and upcoming equipment in due order: a range scan on ix_equipment_next_due
+    # that stops after `limit` rows. Returns (rows, truncated).
+    from models import Equipment, db
+    horizon = now + datetime.timedelta(days=days)
+    rows = db.session.scalars(
+        db.select(Equipment).where(Equipment.next_due <= horizon).order_by(Equipment.next_due, Equipment.id).limit(limit + 1)
+    ).all()
+    return rows[:limit], len(rows) > limit
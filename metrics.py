@@ -0,0 +1,10 @@
+# Registry of metric snapshot functions, served together as JSON from /metrics
+_sources = {}
+
+
+def register(name, snapshot):
+    _sources[name] = snapshot
+
+
+def snapshot():
+    return {name: source() for name, source in _sources.items()}
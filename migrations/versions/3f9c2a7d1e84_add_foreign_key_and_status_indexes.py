@@ -0,0 +1,52 @@
+"""Add foreign key and status indexes
+
+Revision ID: 3f9c2a7d1e84
+Revises: 15c38aba9dde
+Create Date: 2026-10-18 10:12:04.518233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a7d1e84'
+down_revision = '15c38aba9dde'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('projects', schema=None) as batch_op:
+        batch_op.create_index('ix_projects_user_id_id', ['user_id', 'id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_projects_trail_system_id'), ['trail_system_id'], unique=False)
+
+    with op.batch_alter_table('tasks', schema=None) as batch_op:
+        batch_op.create_index('ix_tasks_project_id_status', ['project_id', 'status'], unique=False)
+        batch_op.create_index(batch_op.f('ix_tasks_status'), ['status'], unique=False)
+
+    with op.batch_alter_table('equipment', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_equipment_user_id'), ['user_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_equipment_status'), ['status'], unique=False)
+
+    with op.batch_alter_table('expense_reports', schema=None) as batch_op:
+        batch_op.create_index('ix_expense_reports_user_id_id', ['user_id', 'id'], unique=False)
+        batch_op.create_index('ix_expense_reports_user_id_status', ['user_id', 'status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('expense_reports', schema=None) as batch_op:
+        batch_op.drop_index('ix_expense_reports_user_id_status')
+        batch_op.drop_index('ix_expense_reports_user_id_id')
+
+    with op.batch_alter_table('equipment', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_equipment_status'))
+        batch_op.drop_index(batch_op.f('ix_equipment_user_id'))
+
+    with op.batch_alter_table('tasks', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_tasks_status'))
+        batch_op.drop_index('ix_tasks_project_id_status')
+
+    with op.batch_alter_table('projects', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_projects_trail_system_id'))
+        batch_op.drop_index('ix_projects_user_id_id')
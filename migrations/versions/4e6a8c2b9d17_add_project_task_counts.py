@@ -0,0 +1,38 @@
+"""Add project task counts
+
+Revision ID: 4e6a8c2b9d17
+Revises: 7c1d9e3f5a60
+Create Date: 2026-10-18 19:05:37.120944
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e6a8c2b9d17'
+down_revision = '7c1d9e3f5a60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('project_task_counts',
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=64), nullable=False),
+    sa.Column('task_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.PrimaryKeyConstraint('project_id', 'status')
+    )
+
+    # Backfill from the existing tasks
+    op.execute("""
+        INSERT INTO project_task_counts (project_id, status, task_count)
+        SELECT project_id, status, count(*)
+        FROM tasks
+        GROUP BY project_id, status
+    """)
+
+
+def downgrade():
+    op.drop_table('project_task_counts')
@@ -0,0 +1,98 @@
+"""Add structured equipment maintenance schedule
+
+Revision ID: 7c1d9e3f5a60
+Revises: 2b8e6f4a7d10
+Create Date: 2026-10-18 18:32:14.551902
+
+"""
+import calendar
+import datetime
+import re
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1d9e3f5a60'
+down_revision = '2b8e6f4a7d10'
+branch_labels = None
+depends_on = None
+
+# The schedule rules as of this revision, copied from maintenance.py so the backfill
+# does not change when the app's parser does
+ALIASES = {
+    'daily': (1, 'day'),
+    'weekly': (1, 'week'),
+    'biweekly': (2, 'week'),
+    'fortnightly': (2, 'week'),
+    'monthly': (1, 'month'),
+    'quarterly': (3, 'month'),
+    'semiannually': (6, 'month'),
+    'yearly': (1, 'year'),
+    'annually': (1, 'year'),
+}
+UNIT_WORDS = {
+    'd': 'day', 'day': 'day', 'days': 'day',
+    'w': 'week', 'wk': 'week', 'wks': 'week', 'week': 'week', 'weeks': 'week',
+    'mo': 'month', 'mos': 'month', 'month': 'month', 'months': 'month',
+    'y': 'year', 'yr': 'year', 'yrs': 'year', 'year': 'year', 'years': 'year',
+}
+RULE = re.compile(r'^(?:every\s+)?(?:(\d+)\s*)?([a-z]+)$')
+MAX_INTERVAL = {'day': 3650, 'week': 520, 'month': 120, 'year': 10}
+
+
+def parse_schedule(text):
+    # (interval, unit), or None for text that is not a schedule
+    cleaned = ' '.join((text or '').lower().replace('-', ' ').split())
+    if cleaned.replace(' ', '') in ALIASES:
+        return ALIASES[cleaned.replace(' ', '')]
+    match = RULE.match(cleaned)
+    unit = UNIT_WORDS.get(match.group(2)) if match else None
+    if unit is None:
+        return None
+    interval = int(match.group(1) or 1)
+    return (interval, unit) if 1 <= interval <= MAX_INTERVAL[unit] else None
+
+
+def advance(start, interval, unit):
+    if unit == 'day':
+        return start + datetime.timedelta(days=interval)
+    if unit == 'week':
+        return start + datetime.timedelta(weeks=interval)
+    months = interval * (12 if unit == 'year' else 1)
+    month_index = start.month - 1 + months
+    year, month = start.year + month_index // 12, month_index % 12 + 1
+    return start.replace(year=year, month=month, day=min(start.day, calendar.monthrange(year, month)[1]))
+
+
+def upgrade():
+    # Plain ADD COLUMN / CREATE INDEX: batch mode would recreate the table on SQLite and
+    # drop its full-text search triggers
+    op.add_column('equipment', sa.Column('maintenance_interval', sa.Integer(), nullable=True))
+    op.add_column('equipment', sa.Column('maintenance_unit', sa.String(length=8), nullable=True))
+    op.add_column('equipment', sa.Column('last_maintained_at', sa.DateTime(), nullable=True))
+    op.add_column('equipment', sa.Column('next_due', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_equipment_next_due'), 'equipment', ['next_due'], unique=False)
+
+    # Existing free-text schedules are parsed once; rows that do not parse keep their text
+    # and stay off the due list until someone edits them
+    connection = op.get_bind()
+    equipment = sa.table('equipment', sa.column('id'), sa.column('maintenance_schedule'),
+                         sa.column('maintenance_interval'), sa.column('maintenance_unit'), sa.column('next_due'))
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    for row in connection.execute(sa.select(equipment.c.id, equipment.c.maintenance_schedule)).all():
+        rule = parse_schedule(row.maintenance_schedule)
+        if rule is None:
+            continue
+        interval, unit = rule
+        connection.execute(equipment.update().where(equipment.c.id == row.id).values(
+            maintenance_schedule=f'every {unit}' if interval == 1 else f'every {interval} {unit}s',
+            maintenance_interval=interval, maintenance_unit=unit, next_due=advance(now, interval, unit)))
+
+
+def downgrade():
+    op.drop_index(op.f('ix_equipment_next_due'), table_name='equipment')
+    op.drop_column('equipment', 'next_due')
+    op.drop_column('equipment', 'last_maintained_at')
+    op.drop_column('equipment', 'maintenance_unit')
+    op.drop_column('equipment', 'maintenance_interval')
@@ -0,0 +1,45 @@
+"""Add expense summaries
+
+Revision ID: 8d41b7c0e5a2
+Revises: 3f9c2a7d1e84
+Create Date: 2026-10-18 12:40:51.902117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41b7c0e5a2'
+down_revision = '3f9c2a7d1e84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('expense_summaries',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=64), nullable=False),
+    sa.Column('report_count', sa.Integer(), nullable=False),
+    sa.Column('total_amount', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'month', 'status')
+    )
+
+    # Backfill from the existing reports
+    if op.get_bind().dialect.name == 'postgresql':
+        month = "date_trunc('month', date_submitted)::date"
+    else:
+        month = "date(date_submitted, 'start of month')"
+    op.execute(f"""
+        INSERT INTO expense_summaries (user_id, month, status, report_count, total_amount)
+        SELECT user_id, {month}, coalesce(status, 'unknown'), count(*), coalesce(sum(amount), 0)
+        FROM expense_reports
+        WHERE date_submitted IS NOT NULL
+        GROUP BY user_id, {month}, coalesce(status, 'unknown')
+    """)
+
+
+def downgrade():
+    op.drop_table('expense_summaries')
@@ -0,0 +1,59 @@
+"""Cascade deletes to child rows
+
+Revision ID: 9a5f3c7e1b42
+Revises: 4e6a8c2b9d17
+Create Date: 2026-10-18 19:48:03.662510
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a5f3c7e1b42'
+down_revision = '4e6a8c2b9d17'
+branch_labels = None
+depends_on = None
+
+# (table, column, referred table)
+FOREIGN_KEYS = [
+    ('projects', 'trail_system_id', 'trail_systems'),
+    ('tasks', 'project_id', 'projects'),
+    ('project_task_counts', 'project_id', 'projects'),
+]
+
+# Lets batch mode find the unnamed foreign keys SQLite reflects
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+# Batch mode recreates these tables on SQLite, which drops their full-text search triggers
+FTS_TRIGGERS = [
+    'CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN '
+    'INSERT INTO {table}_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END',
+    'CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN '
+    "INSERT INTO {table}_fts({table}_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); END",
+    'CREATE TRIGGER {table}_fts_update AFTER UPDATE OF name, description ON {table} BEGIN '
+    "INSERT INTO {table}_fts({table}_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); "
+    'INSERT INTO {table}_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END',
+]
+
+
+def _replace_foreign_keys(ondelete):
+    dialect = op.get_bind().dialect.name
+    for table, column, referred in FOREIGN_KEYS:
+        # Postgres named the originals itself; SQLite's get names from the convention above
+        old_name = f'{table}_{column}_fkey' if dialect == 'postgresql' else f'fk_{table}_{column}_{referred}'
+        with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(old_name, type_='foreignkey')
+            batch_op.create_foreign_key(old_name, referred, [column], ['id'], ondelete=ondelete)
+    if dialect == 'sqlite':
+        for table in ('projects', 'tasks'):
+            for statement in FTS_TRIGGERS:
+                op.execute(statement.format(table=table))
+
+
+def upgrade():
+    _replace_foreign_keys('CASCADE')
+
+
+def downgrade():
+    _replace_foreign_keys(None)
@@ -0,0 +1,30 @@
+"""Add table versions
+
+Revision ID: b3d8f1a6c2e9
+Revises: 9a5f3c7e1b42
+Create Date: 2026-10-18 21:12:40.518207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d8f1a6c2e9'
+down_revision = '9a5f3c7e1b42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # No backfill: a table without a row is at version 0
+    op.create_table('table_versions',
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+
+
+def downgrade():
+    op.drop_table('table_versions')
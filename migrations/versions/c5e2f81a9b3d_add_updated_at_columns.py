@@ -0,0 +1,35 @@
+"""Add updated_at columns
+
+Revision ID: c5e2f81a9b3d
+Revises: 8d41b7c0e5a2
+Create Date: 2026-10-18 14:02:37.114902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e2f81a9b3d'
+down_revision = '8d41b7c0e5a2'
+branch_labels = None
+depends_on = None
+
+TABLES = ['equipment', 'projects', 'tasks', 'trail_systems', 'expense_reports']
+
+
+def upgrade():
+    # Added nullable and backfilled first: SQLite cannot add a NOT NULL column with a
+    # non-constant default
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f'UPDATE {table} SET updated_at = CURRENT_TIMESTAMP')
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,31 @@
+"""Add job owner
+
+Revision ID: d6f2a9c4e813
+Revises: b3d8f1a6c2e9
+Create Date: 2026-10-18 23:05:17.402931
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6f2a9c4e813'
+down_revision = 'b3d8f1a6c2e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing jobs get no owner, so their status is no longer readable through /jobs/<id>
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_jobs_user_id'), ['user_id'], unique=False)
+        batch_op.create_foreign_key('fk_jobs_user_id_users', 'users', ['user_id'], ['id'], ondelete='SET NULL')
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_jobs_user_id_users', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_jobs_user_id'))
+        batch_op.drop_column('user_id')
@@ -0,0 +1,54 @@
+"""Add full-text search indexes
+
+Revision ID: e7a3b9d41c26
+Revises: c5e2f81a9b3d
+Create Date: 2026-10-18 15:21:09.804417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a3b9d41c26'
+down_revision = 'c5e2f81a9b3d'
+branch_labels = None
+depends_on = None
+
+TABLES = ['projects', 'tasks', 'trail_systems', 'equipment']
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for table in TABLES:
+        if dialect == 'postgresql':
+            # Generated column: filled for existing rows by the ALTER itself
+            op.execute(f"ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+                       f"setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+                       f"setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED")
+            op.execute(f'CREATE INDEX ix_{table}_search_vector ON {table} USING gin (search_vector)')
+        elif dialect == 'sqlite':
+            op.execute(f"CREATE VIRTUAL TABLE {table}_fts USING fts5(name, description, content='{table}', "
+                       f"content_rowid='id', tokenize='porter unicode61')")
+            op.execute(f'CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN '
+                       f'INSERT INTO {table}_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END')
+            op.execute(f'CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN '
+                       f"INSERT INTO {table}_fts({table}_fts, rowid, name, description) "
+                       f"VALUES ('delete', old.id, old.name, old.description); END")
+            op.execute(f'CREATE TRIGGER {table}_fts_update AFTER UPDATE OF name, description ON {table} BEGIN '
+                       f"INSERT INTO {table}_fts({table}_fts, rowid, name, description) "
+                       f"VALUES ('delete', old.id, old.name, old.description); "
+                       f'INSERT INTO {table}_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END')
+            op.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for table in reversed(TABLES):
+        if dialect == 'postgresql':
+            op.execute(f'DROP INDEX ix_{table}_search_vector')
+            op.execute(f'ALTER TABLE {table} DROP COLUMN search_vector')
+        elif dialect == 'sqlite':
+            for trigger in ('insert', 'delete', 'update'):
+                op.execute(f'DROP TRIGGER {table}_fts_{trigger}')
+            op.execute(f'DROP TABLE {table}_fts')
@@ -1,8 +1,13 @@
+import datetime
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin
+from replicas import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+def utcnow():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -25,12 +30,22 @@ class Equipment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), nullable=False)
     description = db.Column(db.Text, nullable=False)
-    status = db.Column(db.String(64), nullable=False)  # New status attribute
-    maintenance_schedule = db.Column(db.String(128), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    status = db.Column(db.String(64), nullable=False, index=True)  # New status attribute
+    maintenance_schedule = db.Column(db.String(128), nullable=False)  # Normalised rule text, e.g. "every 3 months"
+    # The parsed rule, see maintenance.py. next_due is materialised so "due in the next N days"
+    # is an index range scan instead of parsing every schedule on read.
+    maintenance_interval = db.Column(db.Integer)
+    maintenance_unit = db.Column(db.String(8))  # day, week, month or year
+    last_maintained_at = db.Column(db.DateTime)
+    next_due = db.Column(db.DateTime, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, onupdate=utcnow)  # Set on every write; the API derives ETag/Last-Modified from it
 
 class Project(db.Model):
     __tablename__ = 'projects'
+    __table_args__ = (
+        db.Index('ix_projects_user_id_id', 'user_id', 'id'),  # per-user list, paged by id
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), nullable=False)
@@ -38,19 +53,26 @@ class Project(db.Model):
     status = db.Column(db.String(64), nullable=False)
 
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    trail_system_id = db.Column(db.Integer, db.ForeignKey('trail_systems.id'), nullable=False)
+    trail_system_id = db.Column(db.Integer, db.ForeignKey('trail_systems.id', ondelete='CASCADE'), nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, onupdate=utcnow)
 
-    tasks = db.relationship('Task', backref='project', lazy=True)
+    # The database deletes the children (ON DELETE CASCADE); passive_deletes keeps the ORM
+    # from loading them just to delete them one by one
+    tasks = db.relationship('Task', backref='project', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
 
 class Task(db.Model):
     __tablename__ = 'tasks'
+    __table_args__ = (
+        db.Index('ix_tasks_project_id_status', 'project_id', 'status'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), nullable=False)
     description = db.Column(db.Text, nullable=False)
-    status = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(64), nullable=False, index=True)
 
-    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id', ondelete='CASCADE'), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, onupdate=utcnow)
 
 class TrailSystem(db.Model):
     __tablename__ = 'trail_systems'
@@ -60,11 +82,17 @@ class TrailSystem(db.Model):
     location = db.Column(db.String(255))
     map = db.Column(db.String(255))
     description = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, onupdate=utcnow)
 
-    projects = db.relationship('Project', backref='trail_system', lazy=True)
+    projects = db.relationship('Project', backref='trail_system', lazy=True, cascade='all, delete-orphan',
+                               passive_deletes=True)
 
 class ExpenseReport(db.Model):
     __tablename__ = 'expense_reports'
+    __table_args__ = (
+        db.Index('ix_expense_reports_user_id_id', 'user_id', 'id'),  # per-user list, paged by id
+        db.Index('ix_expense_reports_user_id_status', 'user_id', 'status'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     date_submitted = db.Column(db.Date)
@@ -73,3 +101,54 @@ class ExpenseReport(db.Model):
     status = db.Column(db.String(64))
 
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, onupdate=utcnow)
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),  # what workers poll
+    )
+
+    # Background work, see jobs.py
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', name='fk_jobs_user_id_users', ondelete='SET NULL'),
+                        index=True)  # who may see its status
+    name = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String(16), nullable=False, default='queued')  # queued, running, succeeded, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    idempotency_key = db.Column(db.String(128), unique=True)  # held only while the job is pending
+    run_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    locked_until = db.Column(db.DateTime)  # lease of the worker running it
+    last_error = db.Column(db.Text)
+    result = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+class ExpenseSummary(db.Model):
+    __tablename__ = 'expense_summaries'
+
+    # One row per user, calendar month and status, kept current by expense_summary.py
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)  # First day of the month
+    status = db.Column(db.String(64), primary_key=True)
+    report_count = db.Column(db.Integer, nullable=False, default=0)
+    total_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+class ProjectTaskCount(db.Model):
+    __tablename__ = 'project_task_counts'
+
+    # One row per project and task status, kept current by task_counts.py
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id', ondelete='CASCADE'), primary_key=True)
+    status = db.Column(db.String(64), primary_key=True)
+    task_count = db.Column(db.Integer, nullable=False, default=0)
+
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+
+    # One row per table, bumped by every transaction that writes to it, see versions.py
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    changed_at = db.Column(db.DateTime, nullable=False, default=utcnow)
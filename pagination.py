@@ -0,0 +1,55 @@
+from flask import current_app, request
+
+
+class KeysetPage:
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def get_per_page():
+    per_page = request.args.get('per_page', type=int) or current_app.config['PER_PAGE']
+    return max(1, min(per_page, current_app.config['MAX_PER_PAGE']))
+
+
+def keyset_paginate(query, column, per_page=None):
+    # Seek on an indexed, unique column (the primary key) instead of using OFFSET,
+    # so every page costs the same no matter how deep into the table it is.
+    per_page = per_page or get_per_page()
+    after = request.args.get('after', type=int)
+    before = request.args.get('before', type=int)
+
+    if before is not None:
+        # Walk backwards from the cursor, then flip the rows back into ascending order
+        rows = query.filter(column < before).order_by(column.desc()).limit(per_page + 1).all()
+        has_prev = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next = True
+    else:
+        if after is not None:
+            query = query.filter(column > after)
+        rows = query.order_by(column.asc()).limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_prev = after is not None
+
+    key = column.key
+    next_cursor = getattr(rows[-1], key) if rows and has_next else None
+    prev_cursor = getattr(rows[0], key) if rows and has_prev else None
+    return KeysetPage(rows, per_page, next_cursor=next_cursor, prev_cursor=prev_cursor)
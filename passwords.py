@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    # Runs bcrypt on a small, bounded thread pool instead of every request thread.
+    # bcrypt releases the GIL while hashing, so the pool caps how many cores a login storm
+    # can take, and the semaphore caps how many requests may wait for a slot; requests past
+    # that are rejected quickly instead of piling up behind the workers.
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._app = None
+        self._bcrypt = None
+        self._lock = threading.Lock()
+        self._durations = deque(maxlen=1000)
+        self.rounds = None
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def init_app(self, app):
+        app.config.setdefault('BCRYPT_LOG_ROUNDS', 12)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1))
+        app.config.setdefault('PASSWORD_HASH_MAX_QUEUE', 64)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 5)
+        self._app = app
+        self._bcrypt = None
+        self.rounds = app.config['BCRYPT_LOG_ROUNDS']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        self._executor = ThreadPoolExecutor(max_workers=app.config['PASSWORD_HASH_WORKERS'],
+                                            thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(app.config['PASSWORD_HASH_MAX_QUEUE'])
+        metrics.register('password_hashing', self.stats)
+
+    @property
+    def bcrypt(self):
+        # Imported on the first sign-in rather than when a worker starts
+        if self._bcrypt is None:
+            from flask_bcrypt import Bcrypt
+            self._bcrypt = Bcrypt(self._app)
+        return self._bcrypt
+
+    def _timed(self, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._durations.append(time.perf_counter() - started)
+                self.completed += 1
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy()
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return self._executor.submit(self._timed, fn, *args).result()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(self.bcrypt.generate_password_hash, password, self.rounds).decode('utf-8')
+
+    def check(self, pw_hash, password):
+        return self._run(self.bcrypt.check_password_hash, pw_hash, password)
+
+    def needs_rehash(self, pw_hash):
+        # bcrypt hashes look like $2b$12$<salt+digest>, where 12 is the cost
+        try:
+            return int(pw_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def stats(self):
+        with self._lock:
+            durations = sorted(self._durations)
+            in_flight, max_in_flight = self.in_flight, self.max_in_flight
+            completed, rejected = self.completed, self.rejected
+
+        def pct(p):
+            return round(durations[min(len(durations) - 1, int(p / 100 * len(durations)))] * 1000, 2) if durations else None
+
+        return {
+            'rounds': self.rounds,
+            'queue_depth': in_flight,  # waiting for or holding a worker
+            'max_queue_depth': max_in_flight,
+            'completed': completed,
+            'rejected': rejected,
+            'p50_ms': pct(50),
+            'p95_ms': pct(95),
+            'p99_ms': pct(99),
+        }
+
+
+hasher = PasswordHasher()
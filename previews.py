@@ -0,0 +1,87 @@
+import logging
+import os
+from flask import current_app, url_for
+from versions import bump
+from jobs import job, enqueue
+
+log = logging.getLogger(__name__)
+
+# Longest edge in pixels for each rendition of an uploaded map
+PREVIEW_SIZES = {'thumb': 240, 'preview': 1000}
+PREVIEW_DIR = 'previews'
+
+
+
+def preview_name(filename, size):
+    return f'{os.path.splitext(filename)[0]}.{size}.webp'
+
+
+def _open_first_page(path):
+    # PDFs are rasterized with PyMuPDF, images opened with Pillow; both are optional
+    from PIL import Image
+    if path.lower().endswith('.pdf'):
+        try:
+            import pymupdf
+        except ImportError:
+            import fitz as pymupdf  # PyMuPDF before 1.24
+        with pymupdf.open(path) as doc:
+            page = doc[0]
+            zoom = max(PREVIEW_SIZES.values()) / max(page.rect.width, page.rect.height)
+            pixmap = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+            return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+    image = Image.open(path)
+    image.load()
+    return image.convert('RGB')
+
+
+def render_previews(upload_folder, filename):
+    source = os.path.join(upload_folder, filename)
+    target_dir = os.path.join(upload_folder, PREVIEW_DIR)
+    os.makedirs(target_dir, exist_ok=True)
+    if all(os.path.exists(os.path.join(target_dir, preview_name(filename, size))) for size in PREVIEW_SIZES):
+        return  # same content uploaded before
+    try:
+        image = _open_first_page(source)
+    except ImportError as e:
+        log.warning('Skipping map previews for %s: %s is not installed', filename, e.name)
+        return
+    except Exception:
+        log.exception('Could not render map previews for %s', filename)
+        return
+
+    for size, edge in PREVIEW_SIZES.items():
+        rendition = image.copy()
+        rendition.thumbnail((edge, edge))
+        target = os.path.join(target_dir, preview_name(filename, size))
+        # Write under a temporary name so a page never sees a half-written image
+        rendition.save(target + '.tmp', 'WEBP', quality=80, method=4)
+        os.replace(target + '.tmp', target)
+    bump('trail_systems')  # cached list pages were rendered without the thumbnail
+
+
+@job('render_previews')
+def render_previews_job(filename):
+    render_previews(current_app.config['UPLOAD_FOLDER'], filename)
+
+
+def schedule_previews(filename, owner_id=None):
+    # Rendering a large PDF takes seconds, so it happens off the request; call before the
+    # commit that stores the trail system
+    return enqueue('render_previews', idempotency_key=f'previews:{filename}', owner_id=owner_id, filename=filename)
+
+
+def remove_previews(filename):
+    for size in PREVIEW_SIZES:
+        path = os.path.join(current_app.config['UPLOAD_FOLDER'], PREVIEW_DIR, preview_name(filename, size))
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def preview_url(filename, size='thumb'):
+    # None until the background render has finished, so templates can fall back to a link
+    if not filename:
+        return None
+    name = preview_name(filename, size)
+    if not os.path.exists(os.path.join(current_app.config['UPLOAD_FOLDER'], PREVIEW_DIR, name)):
+        return None
+    return url_for('static', filename=f'uploads/{PREVIEW_DIR}/{name}')
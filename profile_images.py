@@ -0,0 +1,62 @@
+import hashlib
+import io
+import os
+from flask import current_app, url_for
+
+# Square avatar and card crops, plus a bounded full-size rendition, in pixels
+PROFILE_IMAGE_SIZES = {'avatar': 64, 'card': 256, 'full': 1024}
+DEFAULT_PROFILE_IMAGE = 'default.jpg'
+
+
+class InvalidProfileImage(ValueError):
+    pass
+
+
+def profile_pics_folder():
+    return os.path.join(current_app.root_path, 'static', 'profile_pics')
+
+
+def variant_name(key, size):
+    return f'{key}-{size}.webp'
+
+
+def is_variant_set(profile_image):
+    # New uploads store a bare content-hash key; older rows store a filename with an extension
+    return bool(profile_image) and '.' not in profile_image
+
+
+def save_profile_image(file_storage):
+    # Decodes the upload, applies and drops its EXIF data, and writes one WebP per size under
+    # a name derived from the image content, so identical uploads share files and every
+    # variant URL can be cached forever. Returns the key to store in User.profile_image.
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    data = file_storage.read()
+    key = hashlib.sha256(data).hexdigest()[:24]
+    folder = profile_pics_folder()
+    if all(os.path.exists(os.path.join(folder, variant_name(key, size))) for size in PROFILE_IMAGE_SIZES):
+        return key
+
+    try:
+        with Image.open(io.BytesIO(data)) as original:
+            image = ImageOps.exif_transpose(original).convert('RGB')
+    except (UnidentifiedImageError, OSError) as e:
+        raise InvalidProfileImage('The uploaded file is not a readable image.') from e
+
+    for size, edge in PROFILE_IMAGE_SIZES.items():
+        if size == 'full':
+            rendition = image.copy()
+            rendition.thumbnail((edge, edge))
+        else:
+            rendition = ImageOps.fit(image, (edge, edge))
+        target = os.path.join(folder, variant_name(key, size))
+        # Saved without exif=..., so location and camera metadata are not carried over
+        rendition.save(target + '.tmp', 'WEBP', quality=80, method=4)
+        os.replace(target + '.tmp', target)
+    return key
+
+
+def profile_image_url(profile_image, size='card'):
+    if is_variant_set(profile_image):
+        return url_for('profile_pic', filename=variant_name(profile_image, size))
+    return url_for('profile_pic', filename=profile_image or DEFAULT_PROFILE_IMAGE)
@@ -0,0 +1,64 @@
+import datetime
+import re
+import sqlalchemy as sa
+from models import db, Project, Task, Equipment, ExpenseReport, TrailSystem
+from search import SEARCHABLE, search_statement
+from versions import versions_statement
+
+
+def hot_queries(dialect_name):
+    # The filters the list and detail pages run on every view, with representative values
+    return {
+        'projects by user, paged': sa.select(Project).where(Project.user_id == 1, Project.id > 0)
+            .order_by(Project.id).limit(25),
+        'projects by trail system': sa.select(Project).where(Project.trail_system_id == 1),
+        'project trail system join': sa.select(Project, TrailSystem)
+            .join(TrailSystem, Project.trail_system_id == TrailSystem.id).where(Project.user_id == 1),
+        'tasks paged': sa.select(Task).where(Task.id > 100).order_by(Task.id).limit(25),
+        'tasks by project': sa.select(Task).where(Task.project_id == 1),
+        'tasks by project and status': sa.select(Task).where(Task.project_id == 1, Task.status == 'completed'),
+        'tasks by status': sa.select(Task).where(Task.status == 'not started'),
+        'equipment by user': sa.select(Equipment).where(Equipment.user_id == 1),
+        'equipment by status': sa.select(Equipment).where(Equipment.status == 'maintenance'),
+        'equipment due soon': sa.select(Equipment).where(Equipment.next_due <= datetime.datetime(2030, 1, 1))
+            .order_by(Equipment.next_due, Equipment.id).limit(201),
+        'expense reports by user, paged': sa.select(ExpenseReport)
+            .where(ExpenseReport.user_id == 1, ExpenseReport.id > 0).order_by(ExpenseReport.id).limit(25),
+        'expense reports by user and status': sa.select(ExpenseReport)
+            .where(ExpenseReport.user_id == 1, ExpenseReport.status == 'submitted'),
+        'table versions (API validators, cache keys)': versions_statement(),
+        'search, every kind': search_statement('trail crew', list(SEARCHABLE), dialect_name, 1, 1, 25),
+        'search, tasks only': search_statement('trail', ['tasks'], dialect_name, 1, 3, 25),
+    }
+
+
+def _explain_sqlite(conn, sql):
+    details = [row[-1] for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql)]
+    # "SCAN tasks" reads the whole table; "SEARCH ..." and "SCAN ... USING INDEX" do not
+    scans = [d for d in details if re.match(r'^SCAN \w+( AS \w+)?$', d)]
+    return details, scans
+
+
+def _explain_postgresql(conn, sql):
+    # Tiny test tables make a sequential scan the cheapest plan anyway, so disable it for
+    # the check: if the planner still picks one, there is no usable index for the query
+    conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    details = [row[0] for row in conn.exec_driver_sql('EXPLAIN ' + sql)]
+    scans = [d.strip() for d in details if 'Seq Scan' in d]
+    return details, scans
+
+
+def check_query_plans(engine=None):
+    # Returns {query name: (plan lines, offending lines)}; an empty offenders list is a pass
+    engine = engine or db.engine
+    explain = {'sqlite': _explain_sqlite, 'postgresql': _explain_postgresql}.get(engine.dialect.name)
+    if explain is None:
+        raise RuntimeError(f'No plan checker for the {engine.dialect.name} dialect')
+
+    results = {}
+    with engine.connect() as conn:
+        for name, statement in hot_queries(engine.dialect.name).items():
+            sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True}))
+            with conn.begin():
+                results[name] = explain(conn, sql)
+    return results
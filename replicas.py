@@ -0,0 +1,202 @@
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+import sqlalchemy as sa
+from flask import current_app, request, session
+from flask_sqlalchemy.session import Session
+import metrics
+
+log = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Postgres standby: seconds behind the primary, or 0 when it has replayed everything it
+# received. Other databases only get a reachability check.
+POSTGRES_LAG = sa.text(
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+)
+
+
+def _plain_select(statement):
+    return isinstance(statement, sa.Select) and statement._for_update_arg is None
+
+
+class RoutingSession(Session):
+    # Sends plain SELECTs to the replica chosen for the request (session.info['replica']).
+    # Flushes, writes, SELECT ... FOR UPDATE and everything after the first write in the
+    # request stay on the primary, so a request always reads what it wrote.
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get('replica')
+        if replica and bind is None:
+            if not self._flushing and _plain_select(clause):
+                return self._db.engines[replica]
+            if self._flushing or not isinstance(clause, (sa.Select, type(None))):
+                self.info['wrote'] = True
+                self.info.pop('replica', None)
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _read(self, method, statement, *args, **kwargs):
+        # A replica that went away since its last check fails the read; the read and the
+        # rest of the request go to the primary instead
+        replica = self.info.get('replica') if not self._flushing and _plain_select(statement) else None
+        try:
+            return method(statement, *args, **kwargs)
+        except sa.exc.OperationalError as e:
+            if replica is None or self.info.get('replica') != replica:
+                raise
+            self.info.pop('replica', None)
+            health = current_app.extensions.get('replica_health')
+            if health is not None:
+                health.mark_failed(replica, e)
+            return method(statement, *args, **kwargs)
+
+    def execute(self, statement, *args, **kwargs):
+        return self._read(super().execute, statement, *args, **kwargs)
+
+    def scalar(self, statement, *args, **kwargs):
+        return self._read(super().scalar, statement, *args, **kwargs)
+
+    def scalars(self, statement, *args, **kwargs):
+        return self._read(super().scalars, statement, *args, **kwargs)
+
+
+@contextmanager
+def primary_reads(db_session):
+    # For reads whose result outlives the request (caches): a lagging replica would store
+    # old rows under a fresh table version
+    replica = db_session.info.pop('replica', None)
+    try:
+        yield
+    finally:
+        if replica:
+            db_session.info['replica'] = replica
+
+
+class ReplicaHealth:
+    # Lag check per replica every check_interval seconds, run on a background thread so a
+    # request only reads the last result and never waits on a slow or dead replica. Until
+    # the first check passes, reads go to the primary.
+    def __init__(self, engines, max_lag, check_interval):
+        self.engines = engines
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._state = {key: {'healthy': False, 'lag': None, 'checked_at': 0.0, 'error': None} for key in engines}
+        self._lock = threading.Lock()
+        self._checker_pid = None
+        self.routed = 0
+        self.fallbacks = 0
+
+    def _check(self, key):
+        engine = self.engines[key]
+        try:
+            with engine.connect() as connection:
+                if connection.dialect.name == 'postgresql':
+                    lag = float(connection.execute(POSTGRES_LAG).scalar() or 0)
+                else:
+                    connection.execute(sa.text('SELECT 1'))
+                    lag = 0.0
+            return {'healthy': lag <= self.max_lag, 'lag': lag, 'error': None}
+        except Exception as e:
+            log.warning('Replica %s failed its health check: %s', key, e)
+            return {'healthy': False, 'lag': None, 'error': str(e).splitlines()[0]}
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            due = [key for key, state in self._state.items()
+                   if force or now - state['checked_at'] >= self.check_interval]
+            for key in due:
+                self._state[key]['checked_at'] = now  # one thread checks, the rest keep the old result
+        for key in due:
+            result = self._check(key)
+            with self._lock:
+                self._state[key].update(result)
+
+    def _run_checks(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                log.exception('Replica health check failed')
+            time.sleep(self.check_interval)
+
+    def start(self):
+        # One checker thread per process; threads do not survive a fork, so each worker
+        # starts its own on its first request
+        with self._lock:
+            if self._checker_pid == os.getpid():
+                return
+            self._checker_pid = os.getpid()
+        threading.Thread(target=self._run_checks, name='replica-health', daemon=True).start()
+
+    def mark_failed(self, key, error):
+        # Out of rotation until the checker next finds it healthy
+        log.warning('Read from replica %s failed, using the primary: %s', key, error)
+        with self._lock:
+            self._state[key].update(healthy=False, checked_at=time.monotonic(), error=str(error).splitlines()[0])
+
+    def pick(self):
+        self.start()
+        healthy = [key for key, state in self._state.items() if state['healthy']]
+        if not healthy:
+            self.fallbacks += 1
+            return None
+        self.routed += 1
+        return random.choice(healthy)
+
+    def stats(self):
+        return {
+            'routed_requests': self.routed,
+            'primary_fallbacks': self.fallbacks,
+            'replicas': {key: {'healthy': state['healthy'], 'lag_seconds': state['lag'], 'error': state['error']}
+                         for key, state in self._state.items()},
+        }
+
+
+def replica_binds(config, engine_options):
+    # SQLALCHEMY_BINDS entries for the configured replicas, pooled like the primary
+    binds = {}
+    for index, url in enumerate(config['SQLALCHEMY_REPLICA_URIS']):
+        options = engine_options(config, url)
+        if sa.engine.make_url(url).get_backend_name() == 'postgresql':
+            # libpq waits on an unreachable host for as long as the OS lets it by default
+            options['connect_args'] = {**options.get('connect_args', {}),
+                                       'connect_timeout': config['REPLICA_CONNECT_TIMEOUT']}
+        binds[f'replica_{index}'] = {'url': url, **options}
+    return binds
+
+
+def init_replicas(app, db):
+    keys = [key for key in app.config.get('SQLALCHEMY_BINDS', {}) if key.startswith('replica_')]
+    if not keys:
+        return None
+    with app.app_context():
+        engines = {key: db.engines[key] for key in keys}
+    health = ReplicaHealth(engines, app.config['REPLICA_MAX_LAG_SECONDS'], app.config['REPLICA_CHECK_INTERVAL'])
+    sticky_seconds = app.config['REPLICA_STICKY_SECONDS']
+
+    @app.before_request
+    def _route_reads():
+        db.session.info.pop('replica', None)
+        db.session.info.pop('wrote', None)
+        # After a write, the same browser reads from the primary for a few seconds so it
+        # sees its own change even if the replicas have not replayed it yet
+        if request.method in SAFE_METHODS and session.get('primary_until', 0) < time.time():
+            replica = health.pick()
+            if replica:
+                db.session.info['replica'] = replica
+
+    @app.after_request
+    def _stick_to_primary(response):
+        if request.method not in SAFE_METHODS or db.session.info.pop('wrote', False):
+            session['primary_until'] = time.time() + sticky_seconds
+        db.session.info.pop('replica', None)
+        return response
+
+    metrics.register('replicas', health.stats)
+    app.extensions['replica_health'] = health
+    return health
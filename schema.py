@@ -0,0 +1,43 @@
+import os
+import sqlalchemy as sa
+from flask import current_app
+from models import db
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+def migration_status():
+    # (revisions the database is at, head revisions in migrations/). alembic is imported
+    # here instead of at startup since it is the slowest import the app has.
+    from alembic.config import Config
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    config = Config()
+    config.set_main_option('script_location', os.path.join(current_app.root_path, 'migrations'))
+    heads = set(ScriptDirectory.from_config(config).get_heads())
+    with db.engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    return current, heads
+
+
+def require_current_schema():
+    # db.create_all() builds the same schema (the search DDL runs from after_create) but
+    # records no revision, so a database made that way must be stamped, as upgrade_schema() does
+    current, heads = migration_status()
+    if current != heads:
+        raise SchemaOutOfDate(f'Database is at {", ".join(sorted(current)) or "no revision"} but the migrations '
+                              f'head is {", ".join(sorted(heads))}; run "flask db upgrade"')
+
+
+def upgrade_schema():
+    # The earliest migrations alter tables that predate them, so an empty database gets
+    # the current models (search DDL included) stamped at the head; any other database
+    # gets its pending migrations. Needs the flask CLI, which sets up Flask-Migrate.
+    from flask_migrate import stamp, upgrade
+    if not sa.inspect(db.engine).get_table_names():
+        db.create_all(bind_key=None)  # replicas get their schema through replication
+        stamp()
+    else:
+        upgrade()
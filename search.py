@@ -0,0 +1,96 @@
+import re
+import sqlalchemy as sa
+from sqlalchemy import DDL, event
+from models import db, Project, Task, TrailSystem, Equipment
+
+# Kind name -> (model, endpoint, view arg) for every searchable table. Each has name and
+# description columns; the database keeps the index current on every write, including
+# bulk inserts and set-based updates that bypass the ORM.
+SEARCHABLE = {
+    'projects': (Project, 'single_project', 'project_id'),
+    'tasks': (Task, 'single_task', 'task_id'),
+    'trail_systems': (TrailSystem, 'single_trail_system', 'trail_system_id'),
+    'equipment': (Equipment, 'single_equipment', 'equipment_id'),
+}
+
+POSTGRES_DDL = [
+    # Name matches outrank description matches
+    "ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+    'CREATE INDEX ix_{table}_search_vector ON {table} USING gin (search_vector)',
+]
+
+# External-content FTS5 table: holds only the index, the text stays in {table}
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE {table}_fts USING fts5(name, description, content='{table}', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    'CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN '
+    'INSERT INTO {table}_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END',
+    'CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN '
+    "INSERT INTO {table}_fts({table}_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); END",
+    'CREATE TRIGGER {table}_fts_update AFTER UPDATE OF name, description ON {table} BEGIN '
+    "INSERT INTO {table}_fts({table}_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); "
+    'INSERT INTO {table}_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END',
+]
+
+
+def _attach_ddl(table):
+    for statement in POSTGRES_DDL:
+        event.listen(table, 'after_create', DDL(statement.format(table=table.name)).execute_if(dialect='postgresql'))
+    for statement in SQLITE_DDL:
+        event.listen(table, 'after_create', DDL(statement.format(table=table.name)).execute_if(dialect='sqlite'))
+    event.listen(table, 'before_drop', DDL(f'DROP TABLE IF EXISTS {table.name}_fts').execute_if(dialect='sqlite'))
+
+
+for model, _, _ in SEARCHABLE.values():
+    _attach_ddl(model.__table__)
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Keeps autogenerate from proposing to drop the index objects made by the DDL above
+    if type_ == 'table' and re.search(r'_fts(_[a-z]+)?$', name):
+        return False
+    return not (type_ in ('column', 'index') and name.endswith('search_vector'))
+
+
+def _fts5_query(text):
+    # Plain words only, each quoted and prefix-matched, so user input can never be parsed
+    # as FTS5 syntax
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', text))
+
+
+def _matches(kind, text, dialect_name, user_id):
+    model = SEARCHABLE[kind][0]
+    table = model.__tablename__
+    columns = (sa.literal(kind).label('kind'), model.id, model.name, model.description)
+    if dialect_name == 'postgresql':
+        vector = sa.literal_column(f'{table}.search_vector')
+        query = sa.func.websearch_to_tsquery('english', text)
+        statement = sa.select(*columns, sa.func.ts_rank(vector, query).label('rank')).where(vector.op('@@')(query))
+    else:
+        fts = sa.table(f'{table}_fts', sa.column('rowid'))
+        # bm25() is lower for better matches; weights favour the name column like the Postgres 'A' weight
+        rank = -sa.func.bm25(sa.literal_column(f'{table}_fts'), 10.0, 1.0)
+        statement = (sa.select(*columns, rank.label('rank'))
+                     .join(fts, fts.c.rowid == model.id)
+                     .where(sa.literal_column(f'{table}_fts').op('MATCH')(_fts5_query(text))))
+    if model is Project:
+        statement = statement.where(Project.user_id == user_id)  # projects are private, as on /projects
+    return statement
+
+
+def search_statement(text, kinds, dialect_name, user_id, page, per_page):
+    # One ranked UNION ALL over the per-table indexes, fetching one row past the page;
+    # ranked results are paged by offset since rank is not a stable seek key
+    union = sa.union_all(*(_matches(kind, text, dialect_name, user_id) for kind in kinds)).subquery()
+    return (sa.select(union).order_by(union.c.rank.desc(), union.c.kind, union.c.id)
+            .limit(per_page + 1).offset((page - 1) * per_page))
+
+
+def find(text, kinds, user_id, page, per_page):
+    # Returns (rows, has_next) for the page
+    if not _fts5_query(text):
+        return [], False
+    rows = db.session.execute(search_statement(text, kinds, db.engine.dialect.name, user_id, page, per_page)).all()
+    return rows[:per_page], len(rows) > per_page
@@ -0,0 +1,127 @@
+import datetime
+import random
+from decimal import Decimal
+import sqlalchemy as sa
+from flask_bcrypt import generate_password_hash
+from models import db, User, TrailSystem, Project, Task, Equipment, ExpenseReport, utcnow
+from maintenance import schedule_columns
+import expense_summary
+import task_counts
+
+SEED_PASSWORD = 'password'
+BATCH_SIZE = 5000
+
+ADJECTIVES = ['North', 'South', 'Upper', 'Lower', 'Hidden', 'Rocky', 'Cedar', 'Pine', 'River', 'Ridge', 'Maple', 'Granite']
+NOUNS = ['Loop', 'Trail', 'Spur', 'Connector', 'Switchback', 'Overlook', 'Bridge', 'Climb', 'Descent', 'Meadow']
+WORK = ['Clear deadfall on', 'Armor the tread on', 'Reroute', 'Install drainage dips on', 'Brush back',
+        'Rebuild the bridge on', 'Re-blaze', 'Inspect', 'Widen corners on', 'Repair erosion on']
+EQUIPMENT = ['Chainsaw', 'Pulaski', 'McLeod', 'Rock bar', 'Brush cutter', 'Wheelbarrow', 'Mini excavator',
+             'Power carrier', 'Plate compactor', 'Hand saw']
+EXPENSES = ['Fuel for saws', 'Replacement chains', 'Lumber for boardwalk', 'Volunteer lunch', 'Gravel delivery',
+            'Signage', 'Trailer rental', 'First aid restock']
+
+# Rows per task for every other table, so one --tasks knob scales the whole dataset
+RATIOS = {
+    'users': 1 / 1000,
+    'trail_systems': 1 / 2000,
+    'projects': 1 / 20,
+    'equipment': 1 / 10,
+    'expense_reports': 1 / 5,
+}
+
+
+def trail_name(rng):
+    return f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}'
+
+
+def equipment_schedule(rng, now):
+    # Serviced some time in the last year or so, so the seed has both overdue and upcoming equipment
+    last_maintained_at = now - datetime.timedelta(days=rng.randint(0, 400))
+    return {'last_maintained_at': last_maintained_at,
+            **schedule_columns(*rng.choice([(30, 'day'), (3, 'month'), (1, 'year')]), last_maintained_at, now)}
+
+
+def plan_counts(tasks):
+    counts = {table: max(3, int(tasks * ratio)) for table, ratio in RATIOS.items()}
+    counts['tasks'] = tasks
+    return counts
+
+
+def _insert_batches(model, rows, batch_size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(sa.insert(model), batch)
+            batch = []
+    if batch:
+        db.session.execute(sa.insert(model), batch)
+
+
+def _ids(model, start):
+    return db.session.scalars(sa.select(model.id).where(model.id > start)).all()
+
+
+def _max_id(model):
+    return db.session.scalar(sa.select(sa.func.coalesce(sa.func.max(model.id), 0)))
+
+
+def seed(tasks=10000, seed_value=42, echo=print):
+    # Bulk inserts through Core in fixed-size batches keep memory flat even at 1M tasks
+    rng = random.Random(seed_value)
+    counts = plan_counts(tasks)
+    password = generate_password_hash(SEED_PASSWORD).decode('utf-8')
+
+    start = _max_id(User)
+    _insert_batches(User, (
+        {'username': f'crew{start + n}', 'email': f'crew{start + n}@example.org', 'password': password,
+         'bio': f'Trail crew member since {rng.randint(2005, 2023)}.'}
+        for n in range(1, counts['users'] + 1)))
+    user_ids = _ids(User, start)
+    echo(f'users: {len(user_ids)}')
+
+    start = _max_id(TrailSystem)
+    _insert_batches(TrailSystem, (
+        {'name': f'{trail_name(rng)} Trail System', 'location': f'{rng.choice(ADJECTIVES)} County',
+         'map': None, 'description': 'Singletrack network maintained by volunteer crews.'}
+        for _ in range(counts['trail_systems'])))
+    trail_system_ids = _ids(TrailSystem, start)
+    echo(f'trail systems: {len(trail_system_ids)}')
+
+    start = _max_id(Project)
+    _insert_batches(Project, (
+        {'name': f'{rng.choice(WORK)} {trail_name(rng)}', 'description': 'Seasonal maintenance project.',
+         'status': rng.choice(['active', 'completed', 'on hold']), 'user_id': rng.choice(user_ids),
+         'trail_system_id': rng.choice(trail_system_ids)}
+        for _ in range(counts['projects'])))
+    project_ids = _ids(Project, start)
+    echo(f'projects: {len(project_ids)}')
+
+    _insert_batches(Task, (
+        {'name': f'{rng.choice(WORK)} {trail_name(rng)}', 'description': 'Bring gloves, water and hand tools.',
+         'status': rng.choice(['in progress', 'completed', 'not started']), 'project_id': rng.choice(project_ids)}
+        for _ in range(counts['tasks'])))
+    echo(f'tasks: {counts["tasks"]}')
+
+    now = utcnow()
+    _insert_batches(Equipment, (
+        {'name': f'{rng.choice(EQUIPMENT)} #{n}', 'description': 'Stored in the east tool shed.',
+         'status': rng.choice(['active', 'maintenance', 'out of order']),
+         **equipment_schedule(rng, now),
+         'user_id': rng.choice(user_ids)}
+        for n in range(counts['equipment'])))
+    echo(f'equipment: {counts["equipment"]}')
+
+    today = datetime.date.today()
+    _insert_batches(ExpenseReport, (
+        {'date_submitted': today - datetime.timedelta(days=rng.randint(0, 730)),
+         'expense_details': rng.choice(EXPENSES), 'amount': Decimal(rng.randint(500, 250000)) / 100,
+         'status': rng.choice(['submitted', 'approved', 'denied']), 'user_id': rng.choice(user_ids)}
+        for _ in range(counts['expense_reports'])))
+    echo(f'expense reports: {counts["expense_reports"]}')
+
+    db.session.commit()
+    # Core inserts skip the flush hooks that keep the derived tables current
+    expense_summary.rebuild()
+    task_counts.rebuild()
+    return counts
@@ -1,383 +1,581 @@
 import os
 import sqlalchemy as sa
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import render_template, request, redirect, url_for, flash, jsonify, send_from_directory, abort, Response, stream_with_context
 from flask_login import login_user, login_required, logout_user, current_user
-from models import User, Project, Task, Equipment, TrailSystem, ExpenseReport, db
-from app import login_manager, app
+from models import User, Project, Task, Equipment, TrailSystem, ExpenseReport, Job, db, utcnow
+from maintenance import schedule_columns, advance, due_equipment
 from forms import LoginForm, EditTrailSystemForm, RegistrationForm, UserProfileForm, ProjectForm, TaskForm, TrailSystemForm, ExpenseReportForm, EquipmentForm
-from flask_bcrypt import Bcrypt
-from dotenv import load_dotenv
+from passwords import hasher, PasswordHasherBusy
+from previews import schedule_previews
+from storage import store_upload, send_upload
+from jobs import enqueue, public_state as job_state
+from expense_summary import summary_for
+from task_counts import progress
+import bulk
+from search import SEARCHABLE, find
+from chunked_uploads import UploadError, start_upload, append_chunk, load_state, claim_upload, public_state
+from profile_images import save_profile_image, is_variant_set, profile_pics_folder, InvalidProfileImage
+from pagination import keyset_paginate, get_per_page
+from loaders import eager
+from instrumentation import query_budget
+from fragment_cache import fragment_cache
+from identity import identity_cache
 import datetime
-from werkzeug.utils import secure_filename
-
-load_dotenv()
-
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
-
-bcrypt = Bcrypt(app)
-
-@app.route('/')
-def home():
-    return render_template('home.html')
-
-# --- Registration/Login/Logout/Users ---
-
-@app.route('/register', methods=['GET', 'POST'])
-def register():
-    form = RegistrationForm()
-    if form.validate_on_submit():
-        hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
-        new_user = User(username=form.username.data, email=form.email.data, password=hashed_password)
-        db.session.add(new_user)
-        db.session.commit()
-        flash('Registration successful. Please log in.', 'success')
-        return redirect(url_for('login'))
-    return render_template('register.html', form=form)
-
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    form = LoginForm()
-    if form.validate_on_submit():
-        user = User.query.filter_by(username=form.username.data).first()
-        if user and bcrypt.check_password_hash(user.password, form.password.data):
-            login_user(user)
-            flash('Login successful.', 'success')
-            return redirect(url_for('home'))
-        else:
-            flash('Login Unsuccessful. Please check username and password', 'danger')
-    return render_template('login.html', form=form)
-
-@app.route('/logout')
-@login_required
-def logout():
-    logout_user()
-    flash('You have been logged out.', 'info')
-    return redirect(url_for('home'))
-
-@app.route('/users', methods=['GET'])
-@login_required
-def users():
-    user_list = User.query.all()
-    return render_template('users.html', users=user_list)
-
-@app.route('/users/<int:user_id>', methods=['GET', 'POST'])
-@login_required
-def user_profile(user_id):
-    user = User.query.get_or_404(user_id)
-    form = UserProfileForm()
-    if form.validate_on_submit():
-        # Check the old password if it is entered
-        if form.old_password.data and bcrypt.check_password_hash(user.password, form.old_password.data):
-            # update profile details
-            user.username = form.username.data
-            user.email = form.email.data
-            user.bio = form.bio.data
-
-            # Only update the password if a new one is entered
-            if form.password.data:
-                user.password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
-
-            # if picture field is not empty, save the picture
-            if form.picture.data:
-                picture_file = secure_filename(form.picture.data.filename)
-                picture_path = os.path.join(app.root_path, 'static/profile_pics', picture_file)
-                form.picture.data.save(picture_path)
-                user.profile_image = picture_file
+import metrics
+
+
+def register_routes(app):
+    # Called by app.create_app. Endpoints are named after the view functions, as url_for expects.
+    @app.route('/')
+    def home():
+        return render_template('home.html')
+
+    @app.errorhandler(PasswordHasherBusy)
+    def password_hasher_busy(error):
+        # Every hashing slot is taken; ask the client to back off instead of tying up a worker
+        return 'Too many sign-ins are being processed. Please try again in a moment.', 503, {'Retry-After': '5'}
+
+    @app.route('/jobs/<int:job_id>', methods=['GET'])
+    @login_required
+    def job_status(job_id):
+        return jsonify(job_state(Job.query.filter_by(id=job_id, user_id=current_user.id).first_or_404()))
+
+    @app.route('/metrics', methods=['GET'])
+    @login_required
+    def metrics_snapshot():
+        return jsonify(metrics.snapshot())
+
+    # --- Registration/Login/Logout/Users ---
+
+    @app.route('/register', methods=['GET', 'POST'])
+    def register():
+        form = RegistrationForm()
+        if form.validate_on_submit():
+            hashed_password = hasher.hash(form.password.data)
+            new_user = User(username=form.username.data, email=form.email.data, password=hashed_password)
+            db.session.add(new_user)
+            db.session.commit()
+            flash('Registration successful. Please log in.', 'success')
+            return redirect(url_for('login'))
+        return render_template('register.html', form=form)
+
+    @app.route('/login', methods=['GET', 'POST'])
+    def login():
+        form = LoginForm()
+        if form.validate_on_submit():
+            user = User.query.filter_by(username=form.username.data).first()
+            if user and hasher.check(user.password, form.password.data):
+                # Upgrade hashes made with an older work factor while we have the plaintext
+                if hasher.needs_rehash(user.password):
+                    user.password = hasher.hash(form.password.data)
+                    db.session.commit()
+                    identity_cache.invalidate(user.id)
+                login_user(user)
+                flash('Login successful.', 'success')
+                return redirect(url_for('home'))
+            else:
+                flash('Login Unsuccessful. Please check username and password', 'danger')
+        return render_template('login.html', form=form)
+
+    @app.route('/logout')
+    @login_required
+    def logout():
+        logout_user()
+        flash('You have been logged out.', 'info')
+        return redirect(url_for('home'))
+
+    @app.route('/users', methods=['GET'])
+    @login_required
+    @query_budget()
+    def users():
+        user_list = keyset_paginate(User.query, User.id)
+        return render_template('users.html', users=user_list)
+
+    @app.route('/users/<int:user_id>', methods=['GET', 'POST'])
+    @login_required
+    def user_profile(user_id):
+        user = eager(User.query, 'user_profile').filter_by(id=user_id).first_or_404()
+        form = UserProfileForm()
+        if form.validate_on_submit():
+            # Check the old password if it is entered
+            if form.old_password.data and hasher.check(user.password, form.old_password.data):
+                # update profile details
+                user.username = form.username.data
+                user.email = form.email.data
+                user.bio = form.bio.data
+
+                # Only update the password if a new one is entered
+                if form.password.data:
+                    user.password = hasher.hash(form.password.data)
+
+                # if picture field is not empty, resize it into the avatar/card/full variants
+                if form.picture.data:
+                    try:
+                        user.profile_image = save_profile_image(form.picture.data)
+                    except InvalidProfileImage as e:
+                        flash(str(e), 'danger')
+                        return render_template('user_profile.html', user=user, form=form)
+
+                db.session.commit()
+                identity_cache.invalidate(user.id)
+                flash('Your account has been updated!', 'success')
+                return redirect(url_for('user_profile', user_id=user.id))
+            elif form.old_password.data:
+                flash('Wrong current password.', 'danger')
+        elif request.method == 'GET':
+            form.username.data = user.username
+            form.email.data = user.email
+            form.bio.data = user.bio
+        return render_template('user_profile.html', user=user, form=form)
+
+    @app.route('/profile_pics/<path:filename>', methods=['GET'])
+    def profile_pic(filename):
+        response = send_from_directory(profile_pics_folder(), filename, max_age=3600)
+        # Variant files are named after their content, so a given URL never changes
+        if is_variant_set(filename.split('-')[0]) and filename.endswith('.webp'):
+            response.cache_control.max_age = 31536000
+            response.cache_control.immutable = True
+        return response
+
+    # --- Equipment ---
+
+    @app.route('/equipment', methods=['GET'])
+    @login_required
+    @query_budget()
+    def equipment():
+        equipment_list = fragment_cache.cached('equipment', ['equipment'], lambda: render_template(
+            '_equipment_list.html', equipment_list=keyset_paginate(Equipment.query, Equipment.id)))
+        return render_template('equipment.html', equipment_list=equipment_list,
+                               status_choices=bulk.KINDS['equipment'].status_choices)
+
+    @app.route('/equipment/new', methods=['GET', 'POST'])
+    @login_required
+    def new_equipment():
+        form = EquipmentForm()
+        if form.validate_on_submit():
+            new_equipment = Equipment(
+                name=form.name.data,
+                description=form.description.data,
+                status=form.status.data,
+                user_id=current_user.id,
+                **schedule_columns(*form.maintenance_rule, None, utcnow())
+            )
+            db.session.add(new_equipment)
+            db.session.commit()
+            flash('Equipment added successfully.', 'success')
+            return redirect(url_for('equipment'))
+        return render_template('new_equipment.html', form=form)
+
+    @app.route('/equipment/<int:equipment_id>', methods=['GET', 'POST'])
+    @login_required
+    def single_equipment(equipment_id):
+        equipment = Equipment.query.get_or_404(equipment_id)
+        form = EquipmentForm(obj=equipment)
+
+        if form.validate_on_submit():
+            equipment.name = form.name.data
+            equipment.description = form.description.data
+            equipment.status = form.status.data
+            if form.maintenance_rule != (equipment.maintenance_interval, equipment.maintenance_unit):
+                for column, value in schedule_columns(*form.maintenance_rule, equipment.last_maintained_at, utcnow()).items():
+                    setattr(equipment, column, value)
 
             db.session.commit()
-            flash('Your account has been updated!', 'success')
-            return redirect(url_for('user_profile', user_id=user.id))
-        elif form.old_password.data:
-            flash('Wrong current password.', 'danger')
-    elif request.method == 'GET':
-        form.username.data = user.username
-        form.email.data = user.email
-        form.bio.data = user.bio
-    return render_template('user_profile.html', user=user, form=form)
-
-# --- Equipment ---
-
-@app.route('/equipment', methods=['GET'])
-@login_required
-def equipment():
-    form = EquipmentForm()
-    equipment_list = Equipment.query.all()
-    return render_template('equipment.html', form=form, equipment_list=equipment_list)
-
-@app.route('/equipment/new', methods=['GET', 'POST'])
-@login_required
-def new_equipment():
-    form = EquipmentForm()
-    if form.validate_on_submit():
-        new_equipment = Equipment(
-            name=form.name.data,
-            description=form.description.data,
-            status=form.status.data,
-            maintenance_schedule=form.maintenance_schedule.data,
-            user_id=current_user.id
-        )
-        db.session.add(new_equipment)
+            flash('Equipment updated successfully.', 'success')
+            return redirect(url_for('equipment'))
+
+        return render_template('edit_equipment.html', equipment=equipment, form=form)
+
+    @app.route('/equipment/<int:equipment_id>/maintenance', methods=['POST'])
+    @login_required
+    def log_maintenance(equipment_id):
+        equipment = Equipment.query.get_or_404(equipment_id)
+        if equipment.maintenance_interval is None:
+            flash('Set a maintenance schedule before logging service.', 'danger')
+            return redirect(url_for('single_equipment', equipment_id=equipment.id))
+        now = utcnow()
+        equipment.last_maintained_at = now
+        equipment.next_due = advance(now, equipment.maintenance_interval, equipment.maintenance_unit)
         db.session.commit()
-        flash('Equipment added successfully.', 'success')
-        return redirect(url_for('equipment'))
-    return render_template('new_equipment.html', form=form)
-
-@app.route('/equipment/<int:equipment_id>', methods=['GET', 'POST'])
-@login_required
-def single_equipment(equipment_id):
-    equipment = Equipment.query.get_or_404(equipment_id)
-
-    if request.method == 'POST':
-        equipment.name = request.form['name']
-        equipment.description = request.form['description']
-        equipment.status = request.form['status']
-        equipment.maintenance_schedule = request.form['maintenance_schedule']
-
+        flash(f'Maintenance logged. Next service due {equipment.next_due:%Y-%m-%d}.', 'success')
+        return redirect(request.referrer or url_for('equipment'))
+
+    @app.route('/equipment/due', methods=['GET'])
+    @login_required
+    @query_budget()
+    def equipment_due():
+        days = max(0, min(request.args.get('days', 14, type=int), 3650))
+        now = utcnow()
+        due, truncated = due_equipment(days, now)
+        return render_template('equipment_due.html', due=due, truncated=truncated, days=days, now=now)
+
+    @app.route('/equipment/<int:equipment_id>/delete', methods=['POST'])
+    @login_required
+    def delete_equipment(equipment_id):
+        equipment = Equipment.query.get_or_404(equipment_id)
+
+        db.session.delete(equipment)
         db.session.commit()
-        flash('Equipment updated successfully.', 'success')
-        return redirect(url_for('equipment'))
 
-    return render_template('edit_equipment.html', equipment=equipment)
-
-@app.route('/equipment/<int:equipment_id>/delete', methods=['POST'])
-@login_required
-def delete_equipment(equipment_id):
-    equipment = Equipment.query.get_or_404(equipment_id)
+        flash('Equipment deleted successfully.', 'success')
+        return redirect(url_for('equipment'))
 
-    db.session.delete(equipment)
-    db.session.commit()
+    # --- Projects ---
+
+    @app.route('/projects', methods=['GET'])
+    @login_required
+    @query_budget()
+    def projects():
+        projects = keyset_paginate(eager(Project.query, 'projects').filter_by(user_id=current_user.id), Project.id)
+        return render_template('projects.html', projects=projects, progress=progress([p.id for p in projects]))
+
+    @app.route('/new_project', methods=['GET', 'POST'])
+    @login_required
+    def new_project():
+        form = ProjectForm(request.form)
+        if form.validate_on_submit():
+            new_project = Project(name=form.name.data, description=form.description.data, status=form.status.data, user_id=current_user.id, trail_system_id=form.trail_system_id.data)
+            db.session.add(new_project)
+            db.session.commit()
+            flash('Project added successfully.', 'success')
+            return redirect(url_for('projects'))
+        return render_template('new_project.html', form=form)
+
+    @app.route('/projects/<int:project_id>', methods=['GET', 'POST'])
+    @login_required
+    def single_project(project_id):
+        project = Project.query.get_or_404(project_id)
+        form = ProjectForm(obj=project)
+
+        if form.validate_on_submit():
+            project.name = form.name.data
+            project.description = form.description.data
+            if form.status.data:  # Check if a status was selected
+                project.status = form.status.data
 
-    flash('Equipment deleted successfully.', 'success')
-    return redirect(url_for('equipment'))
+            db.session.commit()
+            flash('Project updated successfully.', 'success')
+            return redirect(url_for('projects'))
 
-# --- Projects ---
+        return render_template('edit_project.html', form=form, project=project)
 
-@app.route('/projects', methods=['GET'])
-@login_required
-def projects():
-    projects = Project.query.filter_by(user_id=current_user.id).all()
-    return render_template('projects.html', projects=projects)
+    @app.route('/projects/<int:project_id>/delete', methods=['POST'])
+    @login_required
+    def delete_project(project_id):
+        project = Project.query.get_or_404(project_id)
 
-@app.route('/new_project', methods=['GET', 'POST'])
-@login_required
-def new_project():
-    trail_systems = [(ts.id, ts.name) for ts in TrailSystem.query.all()] # get a list of all trail systems
-    form = ProjectForm(request.form)
-    form.trail_system_id.choices = trail_systems # set the choices for the trail_system_id field
-    if form.validate_on_submit():
-        new_project = Project(name=form.name.data, description=form.description.data, status=form.status.data, user_id=current_user.id, trail_system_id=form.trail_system_id.data)
-        db.session.add(new_project)
+        db.session.delete(project)
         db.session.commit()
-        flash('Project added successfully.', 'success')
-        return redirect(url_for('projects'))
-    return render_template('new_project.html', form=form)
-
-@app.route('/projects/<int:project_id>', methods=['GET', 'POST'])
-@login_required
-def single_project(project_id):
-    project = Project.query.get_or_404(project_id)
-    form = ProjectForm(obj=project)
 
-    if form.validate_on_submit():
-        project.name = form.name.data
-        project.description = form.description.data
-        if form.status.data:  # Check if a status was selected
-            project.status = form.status.data
-
-        db.session.commit()
-        flash('Project updated successfully.', 'success')
+        flash('Project deleted successfully.', 'success')
         return redirect(url_for('projects'))
 
-    return render_template('edit_project.html', form=form, project=project)
+    # --- Tasks ---
+
+    @app.route('/tasks', methods=['GET'])
+    @login_required
+    @query_budget()
+    def tasks():
+        # Page through all tasks, not filtered by project_id
+        task_list = fragment_cache.cached('tasks', ['tasks'], lambda: render_template(
+            '_task_list.html', tasks=keyset_paginate(Task.query, Task.id)))
+        return render_template('tasks.html', task_list=task_list, status_choices=bulk.KINDS['tasks'].status_choices)
+
+    @app.route('/new_task', methods=['GET', 'POST'])
+    @login_required
+    def new_task():
+        form = TaskForm()
+        if form.validate_on_submit():
+            new_task = Task(name=form.name.data, description=form.description.data, status=form.status.data, project_id=form.project_id.data)
+            db.session.add(new_task)
+            db.session.commit()
+            flash('Task added successfully.', 'success')
+            return redirect(url_for('tasks'))
+        return render_template('new_task.html', form=form)
 
-@app.route('/projects/<int:project_id>/delete', methods=['POST'])
-@login_required
-def delete_project(project_id):
-    project = Project.query.get_or_404(project_id)
+    @app.route('/tasks/<int:task_id>', methods=['GET', 'POST'])
+    @login_required
+    def single_task(task_id):
+        task = Task.query.get_or_404(task_id)
+        form = TaskForm(obj=task)
 
-    db.session.delete(project)
-    db.session.commit()
+        if form.validate_on_submit():
+            task.name = form.name.data
+            task.description = form.description.data
+            task.status = form.status.data
 
-    flash('Project deleted successfully.', 'success')
-    return redirect(url_for('projects'))
+            db.session.commit()
+            flash('Task updated successfully.', 'success')
+            return redirect(url_for('tasks'))
 
-# --- Tasks ---
+        return render_template('edit_task.html', task=task, form=form)
 
-@app.route('/tasks', methods=['GET'])
-@login_required
-def tasks():
-    form = TaskForm()
-    tasks = Task.query.all() # Fetch all tasks, not filtered by project_id
-    return render_template('tasks.html', tasks=tasks, form=form)
+    @app.route('/tasks/<int:task_id>/delete', methods=['POST'])
+    @login_required
+    def delete_task(task_id):
+        task = Task.query.get_or_404(task_id)
 
-@app.route('/new_task', methods=['GET', 'POST'])
-@login_required
-def new_task():
-    form = TaskForm()
-    if form.validate_on_submit():
-        new_task = Task(name=form.name.data, description=form.description.data, status=form.status.data, project_id=form.project_id.data)
-        db.session.add(new_task)
+        db.session.delete(task)
         db.session.commit()
-        flash('Task added successfully.', 'success')
-        return redirect(url_for('tasks'))
-    return render_template('new_task.html', form=form)
 
-@app.route('/tasks/<int:task_id>', methods=['GET', 'POST'])
-@login_required
-def single_task(task_id):
-    task = Task.query.get_or_404(task_id)
-    form = TaskForm(obj=task)
-
-    if form.validate_on_submit():
-        task.name = form.name.data
-        task.description = form.description.data
-        task.status = form.status.data
-
-        db.session.commit()
-        flash('Task updated successfully.', 'success')
+        flash('Task deleted successfully.', 'success')
         return redirect(url_for('tasks'))
 
-    return render_template('edit_task.html', task=task, form=form)
-
-@app.route('/tasks/<int:task_id>/delete', methods=['POST'])
-@login_required
-def delete_task(task_id):
-    task = Task.query.get_or_404(task_id)
-
-    db.session.delete(task)
-    db.session.commit()
-
-    flash('Task deleted successfully.', 'success')
-    return redirect(url_for('tasks'))
-
-# --- Trail Systems ---
-@app.route('/trail_systems', methods=['GET'])
-@login_required
-def trail_systems():
-    trail_systems = TrailSystem.query.all()
-    return render_template('trail_systems.html', trail_systems=trail_systems)
-
-@app.route('/new_trail_system', methods=['GET', 'POST'])
-@login_required
-def new_trail_system():
-    form = TrailSystemForm()
-
-    if form.validate_on_submit():
-        f = form.map.data
-        filename = secure_filename(f.filename)
-        f.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-
-        new_trail_system = TrailSystem(
-            name=form.name.data,
-            location=form.location.data,
-            description=form.description.data,
-            map=filename
-        )
-        db.session.add(new_trail_system)
-        db.session.commit()
+    # --- Trail Systems ---
+    @app.route('/trail_systems', methods=['GET'])
+    @login_required
+    @query_budget()
+    def trail_systems():
+        trail_system_list = fragment_cache.cached('trail_systems', ['trail_systems'], lambda: render_template(
+            '_trail_system_list.html', trail_systems=keyset_paginate(TrailSystem.query, TrailSystem.id)))
+        return render_template('trail_systems.html', trail_system_list=trail_system_list)
+
+    @app.route('/new_trail_system', methods=['GET', 'POST'])
+    @login_required
+    def new_trail_system():
+        form = TrailSystemForm()
+
+        if form.validate_on_submit():
+            try:
+                filename = claim_upload(form.upload_id.data, current_user.id) if form.upload_id.data else store_upload(form.map.data)
+            except UploadError as e:
+                flash(str(e), 'danger')
+                return render_template('new_trail_system.html', form=form)
+
+            new_trail_system = TrailSystem(
+                name=form.name.data,
+                location=form.location.data,
+                description=form.description.data,
+                map=filename
+            )
+            db.session.add(new_trail_system)
+            schedule_previews(filename, owner_id=current_user.id)
+            db.session.commit()
 
-        flash('New trail system added successfully.', 'success')
-        return redirect(url_for('trail_systems')) 
-    return render_template('new_trail_system.html', form=form)
-
-@app.route('/trail_systems/<int:trail_system_id>', methods=['GET', 'POST'])
-@login_required
-def single_trail_system(trail_system_id):
-    trail_system = TrailSystem.query.get_or_404(trail_system_id)
-    form = EditTrailSystemForm(obj=trail_system)
-
-    if form.validate_on_submit():
-        trail_system.name = form.name.data
-        trail_system.location = form.location.data
-        trail_system.description = form.description.data
-
-        f = request.files.get('map')
-        if f:
-            # A new file has been uploaded
-            if trail_system.map:
-                os.remove(os.path.join(app.config['UPLOAD_FOLDER'], trail_system.map))
-            filename = secure_filename(f.filename)
-            f.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-            trail_system.map = filename
+            flash('New trail system added successfully.', 'success')
+            return redirect(url_for('trail_systems')) 
+        return render_template('new_trail_system.html', form=form)
+
+    @app.route('/trail_systems/<int:trail_system_id>', methods=['GET', 'POST'])
+    @login_required
+    def single_trail_system(trail_system_id):
+        trail_system = TrailSystem.query.get_or_404(trail_system_id)
+        form = EditTrailSystemForm(obj=trail_system)
+
+        if form.validate_on_submit():
+            trail_system.name = form.name.data
+            trail_system.location = form.location.data
+            trail_system.description = form.description.data
+
+            old_map = trail_system.map
+            f = request.files.get('map')
+            try:
+                if form.upload_id.data:
+                    # The new map was already streamed in through the chunked upload API
+                    trail_system.map = claim_upload(form.upload_id.data, current_user.id)
+                elif f:
+                    # A new file has been uploaded
+                    trail_system.map = store_upload(f)
+            except UploadError as e:
+                flash(str(e), 'danger')
+                return render_template('edit_trail_system.html', trail_system=trail_system, form=form)
+            if old_map != trail_system.map:
+                # Both run after this commit: the old file only goes once nothing references it
+                if old_map:
+                    enqueue('release_upload', owner_id=current_user.id, name=old_map)
+                schedule_previews(trail_system.map, owner_id=current_user.id)
+            db.session.commit()
+            flash('Trail system updated successfully.', 'success')
+            return redirect(url_for('trail_systems'))
+        return render_template('edit_trail_system.html', trail_system=trail_system, form=form)
+
+    # --- Chunked map uploads ---
+    # POST /uploads starts an upload, PUT /uploads/<id> appends a chunk at the offset given in
+    # the Upload-Offset header (with an optional Chunk-SHA256 header), and GET /uploads/<id>
+    # reports the acknowledged offset so a dropped upload can resume from there.
+
+    @app.errorhandler(UploadError)
+    def upload_error(error):
+        return jsonify(error=str(error), **error.extra), error.status_code
+
+    @app.route('/uploads', methods=['POST'])
+    @login_required
+    def new_upload():
+        data = request.get_json(force=True, silent=True) or {}
+        state = start_upload(data.get('filename'), data.get('size'), current_user.id)
+        return jsonify(dict(public_state(state), chunk_size=app.config['MAX_CHUNK_BYTES'])), 201
+
+    @app.route('/uploads/<upload_id>', methods=['GET'])
+    @login_required
+    def upload_status(upload_id):
+        return jsonify(public_state(load_state(upload_id, current_user.id)))
+
+    @app.route('/uploads/<upload_id>', methods=['PUT'])
+    @login_required
+    def upload_chunk(upload_id):
+        offset = request.headers.get('Upload-Offset', type=int)
+        if offset is None:
+            raise UploadError('The Upload-Offset header is required.')
+        state = append_chunk(upload_id, current_user.id, offset, request.stream,
+                             request.content_length, request.headers.get('Chunk-SHA256'))
+        return jsonify(public_state(state))
+
+    @app.route('/maps/<path:filename>', methods=['GET'])
+    @login_required
+    def map_file(filename):
+        return send_upload(filename)
+
+    @app.route('/trail_systems/<int:trail_system_id>/delete', methods=['POST'])
+    @login_required
+    def delete_trail_system(trail_system_id):
+        trail_system = TrailSystem.query.get_or_404(trail_system_id)
+        map_name = trail_system.map
+
+        db.session.delete(trail_system)
+        # delete the associated file once no other trail system shares it
+        if map_name:
+            enqueue('release_upload', owner_id=current_user.id, name=map_name)
         db.session.commit()
-        flash('Trail system updated successfully.', 'success')
+
+        flash('Trail system deleted successfully.', 'success')
         return redirect(url_for('trail_systems'))
-    return render_template('edit_trail_system.html', trail_system=trail_system, form=form)
-
-@app.route('/trail_systems/<int:trail_system_id>/delete', methods=['POST'])
-@login_required
-def delete_trail_system(trail_system_id):
-    trail_system = TrailSystem.query.get_or_404(trail_system_id)
-    
-    # delete the associated file
-    if trail_system.map:
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], trail_system.map)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
-    db.session.delete(trail_system)
-    db.session.commit()
-
-    flash('Trail system deleted successfully.', 'success')
-    return redirect(url_for('trail_systems'))
-
-# --- Expense Reports ---
-
-@app.route('/new_expense_report', methods=['GET', 'POST'])
-@login_required
-def new_expense_report():
-    form = ExpenseReportForm()
-    if form.validate_on_submit():
-        new_expense_report = ExpenseReport(date_submitted=form.date_submitted.data, amount=form.amount.data, expense_details=form.expense_details.data, status='submitted', user_id=current_user.id)
-        db.session.add(new_expense_report)
-        db.session.commit()
-        flash('Expense report submitted successfully.', 'success')
-        return redirect(url_for('expense_reports'))
-    return render_template('new_expense_report.html', form=form)
 
-@app.route('/expense_reports/<int:expense_report_id>', methods=['GET', 'POST'])
-@login_required
-def single_expense_report(expense_report_id):
-    expense_report = ExpenseReport.query.get_or_404(expense_report_id)
-    form = ExpenseReportForm()
+    # --- Expense Reports ---
 
-    if form.validate_on_submit():
-        expense_report.date_submitted = form.date_submitted.data
-        expense_report.amount = form.amount.data
-        expense_report.expense_details = form.expense_details.data
-        expense_report.status = form.status.data
+    @app.route('/new_expense_report', methods=['GET', 'POST'])
+    @login_required
+    def new_expense_report():
+        form = ExpenseReportForm()
+        if form.validate_on_submit():
+            new_expense_report = ExpenseReport(date_submitted=form.date_submitted.data, amount=form.amount.data, expense_details=form.expense_details.data, status='submitted', user_id=current_user.id)
+            db.session.add(new_expense_report)
+            db.session.commit()
+            flash('Expense report submitted successfully.', 'success')
+            return redirect(url_for('expense_reports'))
+        return render_template('new_expense_report.html', form=form)
+
+    @app.route('/expense_reports/<int:expense_report_id>', methods=['GET', 'POST'])
+    @login_required
+    def single_expense_report(expense_report_id):
+        expense_report = ExpenseReport.query.get_or_404(expense_report_id)
+        form = ExpenseReportForm()
+
+        if form.validate_on_submit():
+            expense_report.date_submitted = form.date_submitted.data
+            expense_report.amount = form.amount.data
+            expense_report.expense_details = form.expense_details.data
+            expense_report.status = form.status.data
 
+            db.session.commit()
+            flash('Expense report updated successfully.', 'success')
+            return redirect(url_for('expense_reports'))
+
+        if request.method == 'GET':
+            form.date_submitted.data = expense_report.date_submitted
+            form.amount.data = expense_report.amount
+            form.expense_details.data = expense_report.expense_details
+            form.status.data = expense_report.status
+
+        return render_template('edit_expense_report.html', form=form)
+
+    @app.route('/expense_reports', methods=['GET'])
+    @login_required
+    @query_budget()
+    def expense_reports():
+        expense_reports = keyset_paginate(ExpenseReport.query.filter_by(user_id=current_user.id), ExpenseReport.id)
+        return render_template('expense_reports.html', reports=expense_reports,
+                               status_choices=bulk.KINDS['expense_reports'].status_choices)
+
+    @app.route('/expense_reports/summary', methods=['GET'])
+    @login_required
+    @query_budget()
+    def expense_summary():
+        months = summary_for(current_user.id, max(1, min(request.args.get('months', 24, type=int), 240)))
+        return render_template('expense_summary.html', months=months)
+
+    @app.route('/expense_reports/summary.json', methods=['GET'])
+    @login_required
+    def expense_summary_json():
+        months = max(1, min(request.args.get('months', 24, type=int), 240))
+        return jsonify(months=summary_for(current_user.id, months))
+
+    @app.route('/expense_reports/<int:expense_report_id>/delete', methods=['POST'])
+    @login_required
+    def delete_expense_report(expense_report_id):
+        expense_report = ExpenseReport.query.get_or_404(expense_report_id)
+
+        db.session.delete(expense_report)
         db.session.commit()
-        flash('Expense report updated successfully.', 'success')
-        return redirect(url_for('expense_reports'))
-
-    if request.method == 'GET':
-        form.date_submitted.data = expense_report.date_submitted
-        form.amount.data = expense_report.amount
-        form.expense_details.data = expense_report.expense_details
-        form.status.data = expense_report.status
 
-    return render_template('edit_expense_report.html', form=form)
-
-@app.route('/expense_reports', methods=['GET'])
-@login_required
-def expense_reports():
-    expense_reports = ExpenseReport.query.filter_by(user_id=current_user.id).all()
-    return render_template('expense_reports.html', reports=expense_reports)
-
-@app.route('/expense_reports/<int:expense_report_id>/delete', methods=['POST'])
-@login_required
-def delete_expense_report(expense_report_id):
-    expense_report = ExpenseReport.query.get_or_404(expense_report_id)
-
-    db.session.delete(expense_report)
-    db.session.commit()
-
-    flash('Expense report deleted successfully.', 'success')
-    return redirect(url_for('expense_reports'))
+        flash('Expense report deleted successfully.', 'success')
+        return redirect(url_for('expense_reports'))
 
-if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-    app.run(debug=True)
\ No newline at end of file
+    # --- Search ---
+
+    @app.route('/search', methods=['GET'])
+    @login_required
+    @query_budget()
+    def search():
+        q = request.args.get('q', '')
+        kind = request.args.get('type')
+        kinds = [kind] if kind in SEARCHABLE else list(SEARCHABLE)
+        page = max(1, request.args.get('page', 1, type=int))
+        results, has_next = find(q, kinds, current_user.id, page, get_per_page())
+        return render_template('search.html', q=q, kind=kind, results=results, page=page, has_next=has_next,
+                               searchable=SEARCHABLE)
+
+    # --- Bulk import/export ---
+
+    @app.route('/import/<kind>', methods=['POST'])
+    @login_required
+    def import_rows(kind):
+        upload = request.files.get('file')
+        if kind not in bulk.KINDS or not upload:
+            abort(400)
+        fmt = request.form.get('format') or os.path.splitext(upload.filename)[1].lstrip('.').lower()
+        if fmt not in ('csv', 'jsonl'):
+            abort(400)
+        report = bulk.import_rows(kind, upload.stream, fmt, current_user.id)
+        return jsonify(report), 200 if not report['error_count'] else 207
+
+    @app.route('/delete/<kind>', methods=['POST'])
+    @login_required
+    def delete_rows(kind):
+        if kind not in bulk.KINDS:
+            abort(404)
+        try:
+            ids = bulk.selected_ids(request.form.getlist('ids'))
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return redirect(url_for(kind))
+        result = bulk.delete_rows(kind, ids, current_user.id)
+        flash(f'{len(result["deleted"])} deleted.', 'success')
+        if result['missing']:
+            flash(f'{len(result["missing"])} could not be found or are not yours.', 'danger')
+        return redirect(url_for(kind))
+
+    @app.route('/status/<kind>', methods=['POST'])
+    @login_required
+    def update_status(kind):
+        if kind not in bulk.KINDS:
+            abort(404)
+        try:
+            ids = bulk.selected_ids(request.form.getlist('ids'))
+            results = bulk.update_status(kind, ids, request.form.get('status'), current_user.id)
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return redirect(url_for(kind))
+        outcomes = list(results.values())
+        flash(f'{outcomes.count("updated")} updated, {outcomes.count("unchanged")} already {request.form["status"]}.', 'success')
+        if outcomes.count('not found'):
+            flash(f'{outcomes.count("not found")} could not be found or are not yours.', 'danger')
+        return redirect(url_for(kind))
+
+    @app.route('/export/<kind>.<fmt>', methods=['GET'])
+    @login_required
+    def export_rows(kind, fmt):
+        if kind not in bulk.KINDS or fmt not in ('csv', 'jsonl'):
+            abort(404)
+        mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+        return Response(stream_with_context(bulk.export_rows(kind, fmt, current_user.id)), mimetype=mimetype,
+                        headers={'Content-Disposition': f'attachment; filename={kind}.{fmt}'})
@@ -0,0 +1,68 @@
+import json
+import re
+import statistics
+import subprocess
+import sys
+
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+# Runs in a fresh interpreter: the time to import and build the app, then the first
+# request, which pays for everything deferred (templates, forms, first connection)
+COLD_START = '''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+app = create_app()
+created = time.perf_counter()
+response = app.test_client().get(sys.argv[1])
+finished = time.perf_counter()
+print(json.dumps({'create_app_ms': (created - started) * 1000, 'first_request_ms': (finished - created) * 1000,
+                  'status': response.status_code}))
+'''
+
+
+def import_profile(root, module='wsgi'):
+    # `python -X importtime -c "import <module>"`: (total ms, {top-level package: ms}). The
+    # report lists each import after the ones it triggered, so everything between the
+    # previous top-level line and the module's own line belongs to it.
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=root,
+                            capture_output=True, text=True, check=True)
+    total, by_package = None, {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if not match:
+            continue
+        self_ms, cumulative_ms = int(match.group(1)) / 1000, int(match.group(2)) / 1000
+        depth, name = len(match.group(3)), match.group(4)
+        if depth == 1:
+            if name == module:
+                total = cumulative_ms
+                break
+            by_package = {}
+            continue
+        package = name.split('.')[0]
+        by_package[package] = by_package.get(package, 0) + self_ms
+    return total, by_package
+
+
+def cold_start(root, route):
+    result = subprocess.run([sys.executable, '-c', COLD_START, route], cwd=root,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(root, route='/login', runs=5):
+    # Medians over several fresh processes; one untimed run first so every timed run
+    # starts with compiled .pyc files, as a deployed worker does
+    cold_start(root, route)
+    imports = [import_profile(root) for _ in range(runs)]
+    starts = [cold_start(root, route) for _ in range(runs)]
+    return {
+        'runs': runs,
+        'import_ms': round(statistics.median(total for total, _ in imports), 1),
+        'create_app_ms': round(statistics.median(start['create_app_ms'] for start in starts), 1),
+        'first_request_ms': round(statistics.median(start['first_request_ms'] for start in starts), 1),
+        'first_request_status': starts[-1]['status'],
+        'slowest_packages': [{'package': package, 'ms': round(ms, 1)}
+                             for package, ms in sorted(imports[-1][1].items(), key=lambda item: -item[1])[:10]],
+    }
@@ -0,0 +1,88 @@
+// Sends the map file of a [data-chunked-upload] form through the chunked upload API, then
+// submits the form with only the upload id. Progress is remembered per file, so choosing the
+// same file again after a dropped connection resumes from the last acknowledged offset.
+(function () {
+    async function sha256Hex(buffer) {
+        const digest = await crypto.subtle.digest('SHA-256', buffer);
+        return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+    }
+
+    async function startOrResume(endpoint, file) {
+        const key = 'chunked-upload:' + [file.name, file.size, file.lastModified].join(':');
+        const saved = localStorage.getItem(key);
+        if (saved) {
+            const response = await fetch(endpoint + '/' + saved);
+            if (response.ok) {
+                return {key: key, state: await response.json()};
+            }
+        }
+        const response = await fetch(endpoint, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({filename: file.name, size: file.size})
+        });
+        const state = await response.json();
+        if (!response.ok) {
+            throw new Error(state.error);
+        }
+        localStorage.setItem(key, state.id);
+        return {key: key, state: state};
+    }
+
+    async function upload(endpoint, file, report) {
+        let {key, state} = await startOrResume(endpoint, file);
+        const chunkSize = state.chunk_size || 4 * 1024 * 1024;
+        let failures = 0;
+        while (!state.name) {
+            const chunk = await file.slice(state.offset, state.offset + chunkSize).arrayBuffer();
+            try {
+                const response = await fetch(endpoint + '/' + state.id, {
+                    method: 'PUT',
+                    headers: {'Upload-Offset': String(state.offset), 'Chunk-SHA256': await sha256Hex(chunk)},
+                    body: chunk
+                });
+                const body = await response.json();
+                if (response.ok) {
+                    state = body;
+                    failures = 0;
+                } else if (body.offset !== undefined) {
+                    state.offset = body.offset;  // resend from where the server says it is
+                    failures += 1;
+                } else {
+                    throw new Error(body.error);
+                }
+            } catch (error) {
+                failures += 1;
+                if (failures > 5) {
+                    throw error;
+                }
+                await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+            }
+            report(Math.round(100 * state.offset / file.size));
+        }
+        localStorage.removeItem(key);
+        return state.id;
+    }
+
+    document.querySelectorAll('form[data-chunked-upload]').forEach(function (form) {
+        form.addEventListener('submit', async function (event) {
+            const input = form.querySelector('input[type="file"][name="map"]');
+            if (!input || !input.files.length || form.dataset.uploaded) {
+                return;
+            }
+            event.preventDefault();
+            const status = form.querySelector('.upload-status');
+            try {
+                const id = await upload(form.dataset.chunkedUpload, input.files[0], function (percent) {
+                    status.textContent = 'Uploading map… ' + percent + '%';
+                });
+                form.querySelector('input[name="upload_id"]').value = id;
+                input.value = '';
+                form.dataset.uploaded = 'true';
+                form.submit();
+            } catch (error) {
+                status.textContent = 'Upload failed: ' + error.message + ' Choose the file again to resume.';
+            }
+        });
+    });
+})();
@@ -0,0 +1,99 @@
+import hashlib
+import os
+import re
+import tempfile
+import time
+from flask import current_app, send_file, abort
+from werkzeug.utils import secure_filename
+from models import TrailSystem
+from previews import remove_previews
+from jobs import job
+
+CHUNK_SIZE = 64 * 1024
+# Files younger than this are never reclaimed, so a release racing with an upload of the
+# same content that has not committed yet cannot delete the file out from under it
+RELEASE_GRACE_SECONDS = 300
+CONTENT_NAME = re.compile(r'^[0-9a-f]{64}(\.[a-z0-9]+)?$')
+
+
+def upload_path(name):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], name)
+
+
+def is_content_addressed(name):
+    return bool(CONTENT_NAME.match(name))
+
+
+def store_stream(stream, original_filename):
+    # Hashes while copying to a temporary file in fixed-size chunks, then moves the file to
+    # <sha256><ext>. A file with that digest already on disk is reused instead of stored again.
+    extension = os.path.splitext(secure_filename(original_filename))[1].lower()
+    digest = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(dir=current_app.config['UPLOAD_FOLDER'], suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                out.write(chunk)
+        name = digest.hexdigest() + extension
+        target = upload_path(name)
+        if os.path.exists(target):
+            os.remove(temp_path)
+            os.utime(target)
+        else:
+            os.replace(temp_path, target)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return name
+
+
+def store_upload(file_storage):
+    return store_stream(file_storage.stream, file_storage.filename)
+
+
+@job('release_upload')
+def release(name):
+    # Runs as a job enqueued with the change that dropped a reference, so it only sees
+    # committed rows. Trail systems that still point at the file are its reference count;
+    # the file and its previews go once none are left.
+    if not name or TrailSystem.query.filter_by(map=name).count():
+        return
+    path = upload_path(name)
+    if os.path.exists(path):
+        if time.time() - os.path.getmtime(path) < RELEASE_GRACE_SECONDS and is_content_addressed(name):
+            return
+        os.remove(path)
+    remove_previews(name)
+
+
+def prune_unreferenced():
+    # Sweeps content-addressed files that no trail system points at, e.g. ones kept by the
+    # grace period above; returns the names removed
+    referenced = {name for (name,) in TrailSystem.query.with_entities(TrailSystem.map).distinct()}
+    removed = []
+    for name in os.listdir(current_app.config['UPLOAD_FOLDER']):
+        if is_content_addressed(name) and name not in referenced:
+            if time.time() - os.path.getmtime(upload_path(name)) >= RELEASE_GRACE_SECONDS:
+                os.remove(upload_path(name))
+                remove_previews(name)
+                removed.append(name)
+    return removed
+
+
+def send_upload(name):
+    path = upload_path(secure_filename(name))
+    if not os.path.isfile(path):
+        abort(404)
+    if is_content_addressed(name):
+        # The name is the content hash: a strong ETag for free, and the bytes behind this
+        # URL never change, so browsers may keep them forever
+        response = send_file(path, conditional=True, etag=name.split('.')[0], max_age=31536000)
+        response.cache_control.immutable = True
+    else:
+        response = send_file(path, conditional=True, max_age=3600)
+    # Maps are behind a login: the browser may cache them, shared proxies and CDNs may not
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
@@ -0,0 +1,87 @@
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from counters import apply_deltas, previous_values
+from models import db, Project, Task, ProjectTaskCount
+
+KEY_COLUMNS = ['project_id', 'status']
+TRACKED = ('project_id', 'status')
+DONE = 'completed'
+
+
+def add_delta(deltas, project_id, status, sign):
+    if project_id is None:
+        return
+    entry = deltas.setdefault((project_id, status), {'task_count': 0})
+    entry['task_count'] += sign
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_deltas(session, flush_context, instances):
+    deltas = session.info.setdefault('task_count_deltas', {})
+    # A deleted project's counts go with it (ON DELETE CASCADE)
+    deleted_projects = {project.id for project in session.deleted if isinstance(project, Project)}
+    for task in session.new:
+        if isinstance(task, Task):
+            add_delta(deltas, task.project_id, task.status, 1)
+    for task in session.deleted:
+        if isinstance(task, Task):
+            old = previous_values(session, task, TRACKED)
+            if old['project_id'] not in deleted_projects:
+                add_delta(deltas, old['project_id'], old['status'], -1)
+    for task in session.dirty:
+        if isinstance(task, Task) and session.is_modified(task):
+            old = previous_values(session, task, TRACKED)
+            if (old['project_id'], old['status']) != (task.project_id, task.status):
+                add_delta(deltas, old['project_id'], old['status'], -1)
+                add_delta(deltas, task.project_id, task.status, 1)
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_deltas(session, flush_context):
+    # Same transaction as the task rows, so the counts can never drift from a rolled back write
+    deltas = session.info.pop('task_count_deltas', None)
+    if deltas:
+        apply_deltas(session.connection(), ProjectTaskCount.__table__, KEY_COLUMNS, 'task_count', deltas)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_deltas(session):
+    session.info.pop('task_count_deltas', None)
+
+
+def record_rows(connection, rows, sign):
+    # For set-based inserts, updates and deletes that never pass through the flush hooks above
+    deltas = {}
+    for row in rows:
+        add_delta(deltas, row['project_id'], row['status'], sign)
+    apply_deltas(connection, ProjectTaskCount.__table__, KEY_COLUMNS, 'task_count', deltas)
+
+
+def rebuild():
+    # Recomputes every count from the tasks table in one set-based statement
+    tasks = Task.__table__
+    db.session.execute(sa.delete(ProjectTaskCount))
+    db.session.execute(sa.insert(ProjectTaskCount).from_select(
+        ['project_id', 'status', 'task_count'],
+        sa.select(tasks.c.project_id, tasks.c.status, sa.func.count()).group_by(tasks.c.project_id, tasks.c.status)))
+    db.session.commit()
+
+
+def progress(project_ids):
+    # {project id: {'total': n, 'done': n, 'by_status': {...}}} from the counts table alone,
+    # one query for a whole page of projects
+    result = {project_id: {'total': 0, 'done': 0, 'by_status': {}} for project_id in project_ids}
+    if not result:
+        return result
+    rows = db.session.execute(
+        sa.select(ProjectTaskCount.project_id, ProjectTaskCount.status, ProjectTaskCount.task_count)
+        .where(ProjectTaskCount.project_id.in_(list(result)))
+    ).all()
+    for project_id, status, count in rows:
+        entry = result[project_id]
+        entry['by_status'][status] = count
+        entry['total'] += count
+        if status == DONE:
+            entry['done'] += count
+    return result
@@ -0,0 +1,53 @@
+import pytest
+from app import create_app, init_migrations
+from models import db, User
+from schema import upgrade_schema
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    # Apps on migrated SQLite files of their own. No app context stays pushed, so each
+    # request gets its own, as it would in a server worker.
+    apps = []
+
+    def make(name='app', empty=False, **overrides):
+        app = create_app('test', SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / name}.db',
+                         UPLOAD_FOLDER=str(tmp_path / 'uploads'), **overrides)
+        init_migrations(app)
+        if not empty:
+            with app.app_context():
+                upgrade_schema()
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user_id(app):
+    with app.app_context():
+        user = User(username='crew', email='crew@example.org', password='x')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def logged_in(client, user_id):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+    return client
@@ -0,0 +1,23 @@
+import time
+from models import db, TrailSystem
+from seed import seed
+
+
+def test_collection_validators_move_on_delete(app, client):
+    with app.app_context():
+        seed(tasks=10, echo=lambda message: None)
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+
+    first = client.get('/api/v1/trail_systems')
+    assert client.get('/api/v1/trail_systems', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    time.sleep(1)  # Last-Modified has one-second resolution
+    with app.app_context():
+        db.session.delete(db.session.get(TrailSystem, 1))
+        db.session.commit()
+
+    for headers in ({'If-None-Match': first.headers['ETag']}, {'If-Modified-Since': first.headers['Last-Modified']}):
+        response = client.get('/api/v1/trail_systems', headers=headers)
+        assert response.status_code == 200
+        assert 1 not in [row['id'] for row in response.json['data']]
@@ -0,0 +1,70 @@
+import io
+import sqlalchemy as sa
+from models import db, Project, Task, ExpenseReport, ProjectTaskCount, ExpenseSummary
+from seed import seed
+import expense_summary
+import task_counts
+
+
+def snapshot():
+    return {
+        table.name: db.session.execute(sa.select(table).order_by(*table.primary_key.columns)).all()
+        for table in (ProjectTaskCount.__table__, ExpenseSummary.__table__)
+    }
+
+
+def assert_matches_rebuild(app):
+    # The counters kept up by every write path must equal a recount from the source rows
+    with app.app_context():
+        kept = snapshot()
+        assert kept['project_task_counts'] and kept['expense_summaries']
+        task_counts.rebuild()
+        expense_summary.rebuild()
+        assert snapshot() == kept
+
+
+def test_every_write_path_keeps_the_counters_exact(app, client):
+    with app.app_context():
+        seed(tasks=200, echo=lambda message: None)
+        project = db.session.scalars(sa.select(Project).where(Project.user_id == 1, Project.tasks.any())).first()
+        project_id, trail_system_id = project.id, project.trail_system_id
+        task_ids = db.session.scalars(sa.select(Task.id).where(Task.project_id == project_id)).all()
+        report_ids = db.session.scalars(sa.select(ExpenseReport.id).where(ExpenseReport.user_id == 1)).all()
+        assert len(task_ids) >= 8 and len(report_ids) >= 8
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+
+    def post(url, **data):
+        response = client.post(url, data=data)
+        assert response.status_code == (200 if url.startswith('/import/') else 302), url
+        assert_matches_rebuild(app)
+        return response
+
+    task = {'name': 'Clear deadfall', 'description': 'After the storm', 'project_id': project_id}
+    post('/new_task', status='not started', **task)
+    post(f'/tasks/{task_ids[0]}', status='completed', **task)
+    post(f'/tasks/{task_ids[1]}/delete')
+
+    report = {'date_submitted': '2024-03-05', 'amount': '12.50', 'expense_details': 'Gloves'}
+    post('/new_expense_report', status='submitted', **report)
+    post(f'/expense_reports/{report_ids[0]}', status='approved', **dict(report, date_submitted='2023-11-20'))
+    post(f'/expense_reports/{report_ids[1]}/delete')
+
+    assert post('/import/tasks', format='csv', file=(io.BytesIO(
+        f'name,description,status,project_id\nRake,Tread,completed,{project_id}\nDig,Drain,not started,{project_id}\n'.encode()),
+        'tasks.csv')).json['inserted'] == 2
+    assert post('/import/expense_reports', format='csv', file=(io.BytesIO(
+        b'date_submitted,amount,expense_details,status\n2024-01-02,5.00,Fuel,approved\n2024-01-09,7.25,Snacks,submitted\n'),
+        'reports.csv')).json['inserted'] == 2
+
+    post('/status/tasks', ids=task_ids[2:6], status='in progress')
+    post('/status/expense_reports', ids=report_ids[2:6], status='denied')
+    post('/delete/tasks', ids=task_ids[6:8])
+    post('/delete/expense_reports', ids=report_ids[6:8])
+
+    post(f'/projects/{project_id}/delete')
+    post(f'/trail_systems/{trail_system_id}/delete')
+    with app.app_context():
+        assert db.session.get(Project, project_id) is None
+        assert not db.session.scalar(sa.select(sa.func.count()).select_from(Project).where(
+            Project.trail_system_id == trail_system_id))
@@ -0,0 +1,99 @@
+import datetime
+import time
+import pytest
+from models import db, Job, User, utcnow
+from jobs import job, enqueue, claim, execute, finish
+
+RUNS = []
+
+
+@job('test_flaky')
+def flaky(fail_times):
+    RUNS.append(fail_times)
+    if len(RUNS) <= fail_times:
+        raise RuntimeError('not yet')
+    return len(RUNS)
+
+
+@pytest.fixture(autouse=True)
+def clear_runs():
+    RUNS.clear()
+
+
+def wait_for(app, job_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while True:
+        with app.app_context():
+            row = db.session.get(Job, job_id)
+            if row.status == status or time.monotonic() > deadline:
+                return row
+        time.sleep(0.02)
+
+
+def test_eager_jobs_run_after_commit_and_retry(make_app):
+    app = make_app(JOBS_EAGER=True, JOBS_RETRY_BACKOFF=0.05)
+    with app.app_context():
+        enqueue('test_flaky', fail_times=0)
+        db.session.rollback()
+        job_id = enqueue('test_flaky', max_attempts=3, fail_times=2).id
+        db.session.flush()
+        time.sleep(0.1)
+        assert RUNS == []  # nothing runs before the commit
+        db.session.commit()
+
+    row = wait_for(app, job_id, 'succeeded')
+    assert (row.status, row.attempts, row.result) == ('succeeded', 3, 3)
+    assert RUNS == [2, 2, 2]  # the rolled back job never ran
+
+
+def test_failed_attempts_back_off_until_the_last(make_app):
+    app = make_app(JOBS_EAGER=False, JOBS_RETRY_BACKOFF=60)
+    with app.app_context():
+        job_id = enqueue('test_flaky', max_attempts=2, fail_times=5).id
+        db.session.commit()
+
+        for attempt in (1, 2):
+            [claimed] = claim(10, visibility_timeout=300)
+            assert claimed.attempts == attempt
+            result, error = execute(claimed.name, claimed.payload)
+            finish(claimed, result=result, error=error)
+            assert claim(10, visibility_timeout=300) == []  # not due again until the backoff passes
+            row = db.session.get(Job, job_id)
+            if attempt == 1:
+                assert row.status == 'queued'
+                assert (row.run_at - row.started_at).total_seconds() >= 60 * 0.8
+                db.session.execute(db.update(Job).values(run_at=row.started_at))
+                db.session.commit()
+            db.session.expire_all()
+
+        row = db.session.get(Job, job_id)
+        assert (row.status, row.attempts) == ('failed', 2)
+        assert 'not yet' in row.last_error
+
+
+def test_expired_leases_are_claimed_again(make_app):
+    app = make_app(JOBS_EAGER=False)
+    with app.app_context():
+        job_id = enqueue('test_flaky', fail_times=0).id
+        db.session.commit()
+
+        [claimed] = claim(10, visibility_timeout=60)
+        assert claim(10, visibility_timeout=60) == []  # leased to the first worker
+
+        db.session.execute(db.update(Job).values(locked_until=utcnow() - datetime.timedelta(seconds=1)))
+        db.session.commit()
+        [reclaimed] = claim(10, visibility_timeout=60)
+        assert (reclaimed.id, reclaimed.attempts) == (job_id, 2)
+
+
+def test_job_status_is_only_shown_to_its_owner(app, logged_in, user_id):
+    with app.app_context():
+        other = User(username='other', email='other@example.org', password='x')
+        db.session.add(other)
+        db.session.flush()
+        mine = enqueue('test_flaky', owner_id=user_id, fail_times=0).id
+        theirs = enqueue('test_flaky', owner_id=other.id, fail_times=0).id
+        db.session.commit()
+
+    assert logged_in.get(f'/jobs/{mine}').json['id'] == mine
+    assert logged_in.get(f'/jobs/{theirs}').status_code == 404
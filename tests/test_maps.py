@@ -0,0 +1,12 @@
+import io
+from storage import store_stream
+
+
+def test_maps_are_cached_privately(app, logged_in):
+    with app.app_context():
+        name = store_stream(io.BytesIO(b'%PDF-1.4 map'), 'map.pdf')
+
+    response = logged_in.get(f'/maps/{name}')
+    assert response.status_code == 200
+    assert sorted(response.headers['Cache-Control'].split(', ')) == ['immutable', 'max-age=31536000', 'private']
+    assert logged_in.get(f'/maps/{name}', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
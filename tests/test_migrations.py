@@ -0,0 +1,74 @@
+import sqlalchemy as sa
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from flask_migrate import downgrade, stamp, upgrade
+from models import db
+from search import include_object
+
+# The migrations head when the app was first put under version control
+BASELINE_REVISION = '15c38aba9dde'
+
+# Its schema, as the models declared it then
+baseline = sa.MetaData()
+sa.Table('users', baseline,
+         sa.Column('id', sa.Integer, primary_key=True),
+         sa.Column('username', sa.String(64), unique=True, nullable=False),
+         sa.Column('password', sa.String(128), nullable=False),
+         sa.Column('email', sa.String(120), unique=True, nullable=False),
+         sa.Column('bio', sa.String(500)),
+         sa.Column('managed_trail_systems', sa.String(500)),
+         sa.Column('profile_image', sa.String(255)))
+sa.Table('equipment', baseline,
+         sa.Column('id', sa.Integer, primary_key=True),
+         sa.Column('name', sa.String(128), nullable=False),
+         sa.Column('description', sa.Text, nullable=False),
+         sa.Column('status', sa.String(64), nullable=False),
+         sa.Column('maintenance_schedule', sa.String(128), nullable=False),
+         sa.Column('user_id', sa.Integer, sa.ForeignKey('users.id'), nullable=False))
+sa.Table('trail_systems', baseline,
+         sa.Column('id', sa.Integer, primary_key=True),
+         sa.Column('name', sa.String(128), nullable=False),
+         sa.Column('location', sa.String(255)),
+         sa.Column('map', sa.String(255)),
+         sa.Column('description', sa.Text))
+sa.Table('projects', baseline,
+         sa.Column('id', sa.Integer, primary_key=True),
+         sa.Column('name', sa.String(128), nullable=False),
+         sa.Column('description', sa.Text, nullable=False),
+         sa.Column('status', sa.String(64), nullable=False),
+         sa.Column('user_id', sa.Integer, sa.ForeignKey('users.id'), nullable=False),
+         sa.Column('trail_system_id', sa.Integer, sa.ForeignKey('trail_systems.id'), nullable=False))
+sa.Table('tasks', baseline,
+         sa.Column('id', sa.Integer, primary_key=True),
+         sa.Column('name', sa.String(128), nullable=False),
+         sa.Column('description', sa.Text, nullable=False),
+         sa.Column('status', sa.String(64), nullable=False),
+         sa.Column('project_id', sa.Integer, sa.ForeignKey('projects.id'), nullable=False))
+sa.Table('expense_reports', baseline,
+         sa.Column('id', sa.Integer, primary_key=True),
+         sa.Column('date_submitted', sa.Date),
+         sa.Column('expense_details', sa.Text),
+         sa.Column('amount', sa.Numeric(9, 2)),
+         sa.Column('status', sa.String(64)),
+         sa.Column('user_id', sa.Integer, sa.ForeignKey('users.id'), nullable=False))
+
+
+def schema_diff():
+    with db.engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={'include_object': include_object, 'compare_type': True})
+        return compare_metadata(context, db.metadata)
+
+
+def test_migrations_bring_the_baseline_to_the_models_and_back(make_app):
+    app = make_app(empty=True)
+    with app.app_context():
+        baseline.create_all(db.engine)
+        stamp(revision=BASELINE_REVISION)
+
+        upgrade()
+        assert schema_diff() == []
+
+        downgrade(revision=BASELINE_REVISION)
+        assert set(sa.inspect(db.engine).get_table_names()) == set(baseline.tables) | {'alembic_version'}
+        upgrade()
+        assert schema_diff() == []
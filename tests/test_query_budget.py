@@ -0,0 +1,48 @@
+import sqlalchemy as sa
+from api import RESOURCES
+from bench import SERVER_TIMING_DB
+from models import db, User
+from seed import SEED_PASSWORD, seed
+
+QUERY_STRINGS = {'search': '?q=trail'}
+
+
+def budgeted_urls(app):
+    urls = []
+    for rule in app.url_map.iter_rules():
+        if 'GET' not in rule.methods or not hasattr(app.view_functions[rule.endpoint], 'query_budget'):
+            continue
+        query_string = QUERY_STRINGS.get(rule.endpoint, '')
+        if rule.arguments == {'resource_name'}:
+            urls += [rule.rule.replace('<resource_name>', name) + query_string for name in RESOURCES]
+        else:
+            assert not rule.arguments, f'no sample arguments for {rule.rule}'
+            urls.append(rule.rule + query_string)
+    return urls
+
+
+def query_counts(app, tasks):
+    # Seeds a database of the given size and returns {url: queries} for every budgeted view,
+    # logged in as the first seeded user
+    with app.app_context():
+        seed(tasks=tasks, echo=lambda message: None)
+        username = db.session.scalar(sa.select(User.username).order_by(User.id))
+    client = app.test_client()
+    assert client.post('/login', data={'username': username, 'password': SEED_PASSWORD}).status_code == 302
+
+    counts = {}
+    for url in budgeted_urls(app):
+        client.get(url)  # warm the per-process caches, as on a worker that has been up a while
+        response = client.get(url)
+        assert response.status_code == 200, url
+        counts[url] = int(SERVER_TIMING_DB.search(response.headers['Server-Timing']).group(2))
+    return counts
+
+
+def test_list_views_issue_the_same_queries_at_any_size(make_app):
+    # A page whose query count grows with the rows it shows has an N+1 load. Testing mode
+    # also enforces each view's budget, so an over-budget page raises QueryBudgetExceeded.
+    # Fragment caching is off so every page renders its rows.
+    small = query_counts(make_app('small', FRAGMENT_CACHE=False), tasks=10)
+    large = query_counts(make_app('large', FRAGMENT_CACHE=False), tasks=4000)
+    assert large == small
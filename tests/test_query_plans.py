@@ -0,0 +1,14 @@
+from models import db
+from query_plans import _explain_sqlite, check_query_plans
+
+
+def test_hot_queries_use_indexes(app):
+    with app.app_context():
+        results = check_query_plans()
+    assert {name: scans for name, (plan, scans) in results.items() if scans} == {}
+
+
+def test_full_scans_are_reported(app):
+    with app.app_context(), db.engine.connect() as conn:
+        _, scans = _explain_sqlite(conn, "SELECT * FROM tasks WHERE description = 'x'")
+    assert scans == ['SCAN tasks']
@@ -0,0 +1,50 @@
+import shutil
+import sqlite3
+from models import db, User, TrailSystem
+
+
+def names(client):
+    response = client.get('/api/v1/trail_systems?fields=name')
+    assert response.status_code == 200
+    return [row['name'] for row in response.json['data']]
+
+
+def make_primary(make_app, tmp_path, replica_url):
+    app = make_app('primary', SQLALCHEMY_REPLICA_URIS=[replica_url], REPLICA_CHECK_INTERVAL=60)
+    with app.app_context():
+        db.session.add(User(username='crew', email='crew@example.org', password='x'))
+        db.session.add(TrailSystem(name='Primary'))
+        db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+    return app, client
+
+
+def test_reads_go_to_the_replica_until_a_write(make_app, tmp_path):
+    app, client = make_primary(make_app, tmp_path, f'sqlite:///{tmp_path / "replica.db"}')
+    shutil.copy(tmp_path / 'primary.db', tmp_path / 'replica.db')
+    with sqlite3.connect(tmp_path / 'replica.db') as replica:
+        replica.execute("UPDATE trail_systems SET name = 'Replica'")
+    app.extensions['replica_health'].refresh(force=True)
+
+    assert names(client) == ['Replica']
+    client.patch('/api/v1/tasks', json={'ids': [1], 'status': 'completed'})
+    assert names(client) == ['Primary']  # sticky after the write
+    with client.session_transaction() as session:
+        session['primary_until'] = 0
+    assert names(client) == ['Replica']
+
+
+def test_unreachable_replica_falls_back_to_the_primary(make_app, tmp_path):
+    app, client = make_primary(make_app, tmp_path, f'sqlite:///{tmp_path / "missing" / "replica.db"}')
+    health = app.extensions['replica_health']
+    health.refresh(force=True)
+    assert not health.stats()['replicas']['replica_0']['healthy']
+    assert names(client) == ['Primary']
+    assert health.fallbacks == 1
+
+    # Dies between checks: the failed read is retried on the primary
+    health._state['replica_0']['healthy'] = True
+    assert names(client) == ['Primary']
+    assert not health.stats()['replicas']['replica_0']['healthy']
@@ -0,0 +1,16 @@
+import os
+from config import Config
+from startup import measure
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_cold_start_within_budget(tmp_path, monkeypatch):
+    # Fresh interpreters with the production profile, as a new web worker starts
+    monkeypatch.setenv('APP_CONFIG', 'prod')
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "app.db"}')
+    monkeypatch.setenv('SECRET_KEY', 'test')
+    results = measure(ROOT, runs=3)
+    assert results['first_request_status'] == 200
+    assert results['import_ms'] <= Config.STARTUP_IMPORT_BUDGET_MS, results['slowest_packages']
+    assert results['first_request_ms'] <= Config.STARTUP_FIRST_REQUEST_BUDGET_MS
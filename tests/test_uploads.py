@@ -0,0 +1,49 @@
+import hashlib
+import os
+
+
+def start(client, data, filename='map.pdf'):
+    response = client.post('/uploads', json={'filename': filename, 'size': len(data)})
+    assert response.status_code == 201
+    return response.json['id']
+
+
+def put(client, upload_id, offset, chunk, checksum=None, **headers):
+    headers['Upload-Offset'] = str(offset)
+    headers['Chunk-SHA256'] = checksum or hashlib.sha256(chunk).hexdigest()
+    return client.put(f'/uploads/{upload_id}', data=chunk, headers=headers)
+
+
+def test_chunks_are_checked_and_assembled(app, logged_in):
+    data = b'%PDF-1.4 ' + os.urandom(1000)
+    upload_id = start(logged_in, data)
+
+    assert put(logged_in, upload_id, 0, data[:500], **{'Transfer-Encoding': 'chunked'}).status_code == 411
+    chunk_size, app.config['MAX_CHUNK_BYTES'] = app.config['MAX_CHUNK_BYTES'], 100
+    assert put(logged_in, upload_id, 0, data[:500]).status_code == 413
+    app.config['MAX_CHUNK_BYTES'] = chunk_size
+
+    response = put(logged_in, upload_id, 0, data[:500], checksum='0' * 64)
+    assert (response.status_code, response.json['offset']) == (422, 0)
+    assert put(logged_in, upload_id, 0, data[:500]).json['offset'] == 500
+
+    response = put(logged_in, upload_id, 0, data[500:])
+    assert (response.status_code, response.json['offset']) == (409, 500)
+    assert logged_in.get(f'/uploads/{upload_id}').json['offset'] == 500
+
+    response = put(logged_in, upload_id, 500, data[500:])
+    assert response.status_code == 200
+    assert response.json['name'] == hashlib.sha256(data).hexdigest() + '.pdf'
+    assert logged_in.get(f'/maps/{response.json["name"]}').data == data
+
+
+def test_identical_uploads_share_one_file(app, logged_in):
+    data = b'%PDF-1.4 ' + os.urandom(1000)
+    names = set()
+    for _ in range(2):
+        upload_id = start(logged_in, data)
+        names.add(put(logged_in, upload_id, 0, data).json['name'])
+
+    assert len(names) == 1
+    stored = [entry for entry in os.listdir(app.config['UPLOAD_FOLDER']) if entry.endswith('.pdf')]
+    assert stored == list(names)
@@ -0,0 +1,125 @@
+import functools
+import sqlalchemy as sa
+from flask import g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from instrumentation import per_request
+from models import db, TableVersion, utcnow
+from replicas import primary_reads
+
+# Per-table version counters in the database. A table's row is bumped inside every
+# transaction that inserts, changes or deletes its rows, so every worker sees the new
+# version the moment the change itself is visible, and caches keyed on it miss.
+
+_INSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+# Written on every poll or claim and never cached
+UNVERSIONED = frozenset({'jobs', 'table_versions'})
+
+
+def init_versions(app):
+    per_request(app, 'table_versions')  # read once per request
+
+
+def versions_statement():
+    # Every row, one per table, in key order
+    return sa.select(TableVersion.table_name, TableVersion.version, TableVersion.changed_at).order_by(
+        TableVersion.table_name)
+
+
+def table_versions(*tables):
+    # {table: (version, changed_at)}; tables never written have (0, None). The first call in
+    # a request reads all of them in one query, so however many caches a page checks it
+    # pays once. Read from the primary, as a lagging replica would pair new cache entries
+    # with old versions.
+    if 'table_versions' not in g:
+        with primary_reads(db.session):
+            g.table_versions = {row.table_name: (row.version, row.changed_at)
+                                for row in db.session.execute(versions_statement())}
+    return {table: g.table_versions.get(table, (0, None)) for table in tables}
+
+
+def table_version(table):
+    return table_versions(table)[table][0]
+
+
+def _bump(connection, tables):
+    # Sorted, so concurrent writers lock the rows in the same order
+    table = TableVersion.__table__
+    now = utcnow()
+    statement = _INSERTS[connection.dialect.name](table).values(
+        [{'table_name': name, 'version': 1, 'changed_at': now} for name in sorted(tables)])
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=['table_name'],
+        set_={'version': table.c.version + 1, 'changed_at': statement.excluded.changed_at},
+    ))
+
+
+def bump(*tables):
+    # For changes the database does not see, like a preview image written to disk
+    with db.engine.begin() as connection:
+        _bump(connection, tables)
+    if has_app_context():
+        g.pop('table_versions', None)
+
+
+def _touched(session):
+    return session.info.setdefault('touched_tables', set())
+
+
+@functools.cache
+def _with_cascades(table):
+    # The table plus every table the database deletes from along with it (ON DELETE
+    # CASCADE), since those rows go without the ORM seeing them
+    tables = {table.name}
+    for child in table.metadata.tables.values():
+        if any(fk.ondelete == 'CASCADE' and fk.column.table is table for fk in child.foreign_keys):
+            tables |= _with_cascades(child)
+    return frozenset(tables)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_flush(session, flush_context):
+    for obj in session.new:
+        _touched(session).add(obj.__tablename__)
+    for obj in session.deleted:
+        _touched(session).update(_with_cascades(obj.__table__))
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            _touched(session).add(obj.__tablename__)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk(orm_execute_state):
+    # insert()/update()/delete() statements run through the session never reach the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is None:
+            return
+        if orm_execute_state.is_delete:
+            _touched(orm_execute_state.session).update(_with_cascades(mapper.local_table))
+        else:
+            _touched(orm_execute_state.session).add(mapper.local_table.name)
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_in_transaction(session):
+    # Savepoints leave it to the outer transaction, which may still roll back
+    if session.in_nested_transaction():
+        return
+    session.flush()  # pending changes count too
+    touched = session.info.pop('touched_tables', set()) - UNVERSIONED
+    if touched:
+        _bump(session.connection(), touched)
+
+
+@event.listens_for(Session, 'after_commit')
+def _forget_read_versions(session):
+    if has_app_context():
+        g.pop('table_versions', None)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back(session):
+    session.info.pop('touched_tables', None)
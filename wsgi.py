@@ -0,0 +1,13 @@
+from dotenv import load_dotenv
+
+load_dotenv()  # before config is imported; the flask command (app:create_cli_app) loads .env itself
+
+from app import create_app
+from schema import require_current_schema
+
+app = create_app()
+
+if __name__ == '__main__':
+    with app.app_context():
+        require_current_schema()
+    app.run(debug=True)